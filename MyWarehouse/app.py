@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
 import os
-import plotly.express as px # للمخططات الجمالية
-from io import BytesIO
+from io import StringIO
 from datetime import datetime
-import pdfplumber
-import re
-from difflib import SequenceMatcher
+from warehouse import metrics
+from warehouse.cache import ResultCache, make_key
+from warehouse.jobs import ACTIVE, DONE, FAILED, QUEUED, RUNNING, JobQueue
+# المكتبات الثقيلة (plotly و pdfplumber) تُستورد داخل الصفحات التي تحتاجها فقط
+from warehouse.store import ConcurrentUpdateError, WarehouseStore, plan_batch_deduction
+from warehouse.loader import DataLoader
+from warehouse.exports import EXPORT_FORMATS, EXPORT_KEEP_SECONDS, ExportJob
 
 # 1. إعدادات الصفحة والشكل العام
 st.set_page_config(
@@ -26,180 +29,141 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# 2. إنشاء ملفات البيانات إذا لم توجد
-if not os.path.exists('inventory.csv'):
-    pd.DataFrame(columns=['الصنف', 'الافتتاحي', 'المتبقي']).to_csv('inventory.csv', index=False)
-if not os.path.exists('sales.csv'):
-    pd.DataFrame(columns=['التاريخ', 'الصنف', 'أمتار', 'ملاحظة']).to_csv('sales.csv', index=False)
-
-# 3. تحميل البيانات
-inv_df = pd.read_csv('inventory.csv')
-sales_df = pd.read_csv('sales.csv')
-
-# إضافة عمود الملاحظة إذا لم يكن موجوداً (للملفات القديمة)
-if 'ملاحظة' not in sales_df.columns:
-    sales_df['ملاحظة'] = ''
-
-# 3.1 دوال مساعدة لمعالجة فواتير PDF
-def extract_text_from_pdf(pdf_file):
-    """استخراج النص من ملف PDF"""
-    try:
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
-    except Exception as e:
-        st.error(f"خطأ في قراءة ملف PDF: {e}")
-        return None
-
-def extract_table_from_pdf(pdf_file):
-    """استخراج الجداول من ملف PDF"""
-    try:
-        all_tables = []
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if tables:
-                    all_tables.extend(tables)
-        return all_tables
-    except Exception as e:
-        st.error(f"خطأ في استخراج الجداول: {e}")
-        return []
-
-def find_product_column_index(headers):
-    """العثور على فهرس عمود المنتج"""
-    keywords = ['المنتج', 'الصنف', 'الاسم', 'product', 'item', 'name']
-    for i, header in enumerate(headers):
-        if header:
-            header_text = str(header).strip().lower()
-            for keyword in keywords:
-                if keyword in header_text:
-                    return i
-    return None
-
-def find_quantity_column_index(headers):
-    """العثور على فهرس عمود الكمية"""
-    keywords = ['الكمية', 'quantity', 'qty', 'عدد', 'amount']
-    for i, header in enumerate(headers):
-        if header:
-            header_text = str(header).strip().lower()
-            for keyword in keywords:
-                if keyword in header_text:
-                    return i
-    return None
-
-def extract_products_from_text(text):
-    """استخراج المنتجات من النص باستخدام regex"""
-    products = []
-    lines = text.split('\n')
-    
-    product_pattern = r'(.+?)\s+(\d+\.?\d*)'
-    in_table = False
-    
-    for i, line in enumerate(lines):
-        line_lower = line.strip().lower()
-        # البحث عن بداية الجدول
-        if 'المنتج' in line_lower and 'الكمية' in line_lower:
-            in_table = True
-            continue
-        
-        if in_table and line.strip():
-            # محاولة استخراج المنتج والكمية
-            match = re.search(product_pattern, line)
-            if match:
-                product_name = match.group(1).strip()
-                quantity = match.group(2).strip()
-                try:
-                    qty = float(quantity)
-                    if qty > 0:
-                        products.append({'product': product_name, 'quantity': qty})
-                except:
-                    pass
-    
-    return products
+# 2. الاتصال بقاعدة البيانات (تُنقل ملفات inventory.csv و sales.csv القديمة إليها تلقائياً عند أول تشغيل)
+@st.cache_resource
+def get_store():
+    """مخزن البيانات المشترك بين جميع الجلسات"""
+    return WarehouseStore()
+
+@st.cache_resource
+def get_loader():
+    """ذاكرة الجداول المحللة (تُقرأ من قاعدة البيانات فقط عند تغير البيانات)"""
+    return DataLoader(get_store())
+
+store = get_store()
+
+# 3. تحميل البيانات: كل صفحة تحمل ما تحتاجه فقط (جدول المخزن مشترك بين الجلسات: لا يُعدل مباشرة)
+# سجل المبيعات لا يُحمل كاملاً: الصفحات تقرأ التجميعات أو صفحة واحدة من قاعدة البيانات
+
+# 3.1 المهام الطويلة (قراءة الفواتير وملفات التصدير) تُنفذ في الخلفية
+@st.cache_resource
+def get_result_cache():
+    """ذاكرة نتائج الفواتير على القرص (مشتركة بين جميع الجلسات)"""
+    return ResultCache()
 
-def extract_products_from_tables(tables):
-    """استخراج المنتجات من الجداول"""
-    products = []
+@st.cache_resource
+def get_job_queue():
+    """قائمة المهام الخلفية المشتركة بين جميع الجلسات (النتائج محفوظة في jobs.db)"""
+    loader, result_cache = get_loader(), get_result_cache()
+    runners = {}
     
-    for table in tables:
-        if not table or len(table) < 2:
-            continue
-        
-        # البحث عن صف الرؤوس
-        headers = table[0] if table else []
-        product_col = find_product_column_index(headers)
-        quantity_col = find_quantity_column_index(headers)
-        
-        if product_col is not None and quantity_col is not None:
-            # استخراج البيانات من الصفوف
-            for row in table[1:]:
-                if len(row) > max(product_col, quantity_col):
-                    product_name = str(row[product_col]).strip() if row[product_col] else ""
-                    quantity_str = str(row[quantity_col]).strip() if row[quantity_col] else "0"
-                    
-                    if product_name and product_name.lower() not in ['المنتج', 'الصنف', 'الاسم', '']:
-                        try:
-                            qty = float(re.sub(r'[^\d.]', '', quantity_str))
-                            if qty > 0:
-                                products.append({'product': product_name, 'quantity': qty})
-                        except:
-                            pass
+    def run_invoices(job):
+        # تحميل pdfplumber عند أول مهمة فقط
+        from warehouse.ingest import InvoiceJob
+        if 'invoices' not in runners:
+            runners['invoices'] = InvoiceJob(loader, result_cache)
+        return runners['invoices'](job)
     
-    return products
+    return JobQueue({'invoices': run_invoices, 'export': ExportJob(loader)},
+                    keep_seconds={'export': EXPORT_KEEP_SECONDS})
 
-def similarity_score(str1, str2):
-    """حساب درجة التشابه بين نصين"""
-    return SequenceMatcher(None, str1.lower().strip(), str2.lower().strip()).ratio()
+# أسماء الأصناف لعمود التصحيح في جدول مراجعة الفواتير (مرة واحدة لكل نسخة من أسماء الأصناف)
+@st.cache_resource(max_entries=2)
+def inventory_options(names_version):
+    return sorted(get_loader().inventory()['الصنف'].astype(str).unique())
 
-def match_product_with_inventory(product_name, inventory_df, threshold=0.6):
-    """مطابقة المنتج مع المخزن"""
-    best_match = None
-    best_score = 0
-    
-    for idx, inv_product in enumerate(inventory_df['الصنف']):
-        score = similarity_score(str(product_name), str(inv_product))
-        if score > best_score:
-            best_score = score
-            best_match = (idx, inv_product)
+MATCH_SOURCE_LABELS = {'alias': "🧠 اسم متعلم", 'exact': "مطابق تماماً", 'fuzzy': "تقريبي", 'manual': "✏️ يدوي",
+                       'none': "-"}
+
+JOB_STATUS_LABELS = {QUEUED: "⏳ في الانتظار", RUNNING: "⚙️ قيد التنفيذ", DONE: "✅ انتهت", FAILED: "❌ فشلت"}
+
+@st.fragment(run_every=1.0)
+def job_progress(job_id):
+    """متابعة مهمة قيد التنفيذ (تُحدّث كل ثانية، وتُعاد الصفحة عند انتهاء المهمة)"""
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] not in ACTIVE:
+        st.rerun()
+    text = job['message'] or JOB_STATUS_LABELS[job['status']]
+    if job['total'] > 1:
+        text += f" ({job['done']}/{job['total']})"
+    st.progress(min(job['done'] / job['total'], 1.0) if job['total'] else 0.0, text=text)
+
+def submit_invoice_job(pdf_files):
+    """إرسال ملفات الفواتير إلى قائمة المهام (نفس الملفات مع نفس أسماء الأصناف تُعرض نتيجتها مباشرة)"""
+    from warehouse.ingest import invoice_job_key
     
-    if best_score >= threshold:
-        return best_match[1], best_score
-    return None, best_score
+    files = [(pdf_file.name, pdf_file.getvalue()) for pdf_file in pdf_files]
+    return get_job_queue().submit(
+        'invoices',
+        {'files': [name for name, _ in files]},
+        inputs={f'{i}.pdf': pdf_bytes for i, (_, pdf_bytes) in enumerate(files)},
+        key=invoice_job_key(files, store.names_version(), store.aliases_version()),
+        label='، '.join(name for name, _ in files),
+    )
 
-def process_pdf_invoices(pdf_files, inventory_df):
-    """معالجة ملفات PDF متعددة"""
-    all_extracted_products = []
+# 3.2 ملفات التصدير: تُبنى فقط عند الطلب، ومرة واحدة لكل نسخة من البيانات (مشتركة بين الجلسات)
+def submit_export_job(data_versions, file_format, weekday=None):
+    """مهمة تجهيز ملف الجرد الكامل (weekday=None) أو مبيعات يوم من أيام الأسبوع"""
+    params = {'what': 'weekday' if weekday else 'full', 'weekday': weekday, 'format': file_format}
+    return get_job_queue().submit(
+        'export', params,
+        key=make_key(params['what'], weekday, *data_versions, file_format),
+        label=f"{weekday or 'الجرد الكامل'} ({file_format})",
+    )
+
+def show_export_job(job_id, label, file_name):
+    """تقدم مهمة التصدير، أو زر التحميل بعد انتهائها"""
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+    if job is None:
+        return
+    if job['status'] in ACTIVE:
+        job_progress(job_id)
+    elif job['status'] == FAILED:
+        st.error(f"تعذر تجهيز الملف: {job['error']}")
+    else:
+        result = job['result']
+        st.download_button(
+            label=label,
+            data=job_queue.read_output(job_id, result['file']),
+            file_name=f"{file_name}.{result['ext']}",
+            mime=result['mime']
+        )
+
+# 3.3 عرض الجداول الكبيرة على صفحات (التصفية والتقسيم في قاعدة البيانات، والمتصفح يستلم صفحة واحدة فقط)
+PAGE_SIZES = [25, 50, 100, 250]
+
+def show_paginated_table(key, query, **filters):
+    """عرض صفحة من نتيجة query(limit=, offset=, **filters) -> (الجدول، العدد الكلي)"""
+    col_size, col_page = st.columns(2)
+    with col_size:
+        page_size = st.selectbox("عدد الصفوف في الصفحة:", PAGE_SIZES, key=f"{key}_size")
+    with col_page:
+        page_number = st.number_input("الصفحة:", min_value=1, step=1, key=f"{key}_page")
     
-    for pdf_file in pdf_files:
-        # محاولة استخراج الجداول أولاً
-        tables = extract_table_from_pdf(pdf_file)
-        products = extract_products_from_tables(tables)
-        
-        # إذا لم نجد منتجات في الجداول، جرب استخراج النص
-        if not products:
-            text = extract_text_from_pdf(pdf_file)
-            if text:
-                products = extract_products_from_text(text)
-        
-        # مطابقة المنتجات مع المخزن
-        matched_products = []
-        for prod in products:
-            matched_product, score = match_product_with_inventory(prod['product'], inventory_df)
-            matched_products.append({
-                'original_name': prod['product'],
-                'matched_name': matched_product,
-                'quantity': prod['quantity'],
-                'match_score': score,
-                'file_name': pdf_file.name
-            })
-        
-        all_extracted_products.extend(matched_products)
+    page_df, total = query(limit=page_size, offset=(page_number - 1) * page_size, **filters)
+    pages = max(1, -(-total // page_size))
+    if page_number > pages:
+        # التصفية قللت عدد الصفوف: عرض آخر صفحة متاحة
+        page_number = pages
+        page_df, total = query(limit=page_size, offset=(pages - 1) * page_size, **filters)
     
-    return all_extracted_products
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+    st.caption(f"الصفحة {page_number} من {pages} ({total:,} صف)")
+
+def sales_filters(key):
+    """حقول البحث عن صنف والتصفية حسب الفترة الزمنية لجدول المبيعات"""
+    col_search, col_dates = st.columns(2)
+    with col_search:
+        search = st.text_input("🔍 بحث عن صنف:", key=f"{key}_search")
+    with col_dates:
+        date_from = date_to = None
+        if st.checkbox("تصفية حسب الفترة", key=f"{key}_use_dates"):
+            today = datetime.now().date()
+            dates = st.date_input("الفترة:", value=(today - pd.Timedelta(days=30), today), key=f"{key}_dates")
+            if len(dates) == 2:
+                date_from, date_to = dates
+    return {'search': search or None, 'date_from': date_from, 'date_to': date_to}
 
 # 4. القائمة الجانبية (شعار الشركة والتحكم)
 with st.sidebar:
@@ -208,13 +172,14 @@ with st.sidebar:
     st.markdown("<h2 style='text-align: center; color: #ff4b4b;'>شعار الشركة</h2>", unsafe_allow_html=True)
     st.divider()
     
-    page = st.radio("انتقل إلى:", ["🏠 لوحة التحكم والجرد", "📊 صفحة الإحصائيات المتقدمة", "📄 قراءة فواتير PDF", "⚙️ الإعدادات والرفع"])
+    page = st.radio("انتقل إلى:", ["🏠 لوحة التحكم والجرد", "📊 صفحة الإحصائيات المتقدمة", "📄 قراءة فواتير PDF", "⚙️ الإعدادات والرفع"], key="page")
     
     st.divider()
     st.info("مخزن النواقية الرئيسي")
 
 # --- الصفحة الأولى: لوحة التحكم والجرد ---
 if page == "🏠 لوحة التحكم والجرد":
+    inv_df = get_loader().inventory()
     st.header("📦 إدارة السحب اليومي")
     
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -232,17 +197,17 @@ if page == "🏠 لوحة التحكم والجرد":
     with col3:
         st.write("##")
         if st.button("تسجيل السحب") and item:
-            idx = inv_df[inv_df['الصنف'] == item].index[0]
-            if inv_df.at[idx, 'المتبقي'] >= m_sold:
-                inv_df.at[idx, 'المتبقي'] -= m_sold
-                inv_df.to_csv('inventory.csv', index=False)
-                # تسجيل الحركة
-                new_row = pd.DataFrame([{'التاريخ': pd.Timestamp.now(), 'الصنف': item, 'أمتار': m_sold, 'ملاحظة': ''}])
-                pd.concat([sales_df, new_row]).to_csv('sales.csv', index=False)
-                st.success(f"تم خصم {m_sold} متر بنجاح")
-                st.rerun()
+            # الخصم وتسجيل الحركة في معاملة واحدة (آمنة مع الجلسات المتزامنة)
+            try:
+                deducted = store.record_sale(item, m_sold)
+            except ConcurrentUpdateError as e:
+                st.error(str(e))
             else:
-                st.error("الكمية لا تكفي!")
+                if deducted:
+                    st.success(f"تم خصم {m_sold} متر بنجاح")
+                    st.rerun()
+                else:
+                    st.error("الكمية لا تكفي!")
 
     st.divider()
     
@@ -267,99 +232,91 @@ if page == "🏠 لوحة التحكم والجرد":
         selected_day_en = days_options[selected_day_ar]
     
     with col_filter2:
-        st.write("##")
-        # إنشاء ملف Excel للتحميل
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            inv_df.to_excel(writer, index=False, sheet_name='الجرد')
-            # إضافة ورقة بالمبيعات إذا كانت موجودة
-            if not sales_df.empty:
-                sales_df.to_excel(writer, index=False, sheet_name='المبيعات')
-        output.seek(0)
-        
-        # اسم الملف مع التاريخ
-        today = datetime.now().strftime("%Y-%m-%d")
-        filename = f"جرد_المخزن_{today}.xlsx"
-        
-        st.download_button(
-            label="📥 تحميل ملف الجرد الكامل",
-            data=output.getvalue(),
-            file_name=filename,
-            mime="application/vnd.openpyxl-officedocument.spreadsheetml.sheet"
-        )
+        export_format = st.radio("صيغة ملفات التحميل:", EXPORT_FORMATS, horizontal=True)
+        data_versions = store.versions()
+        # الملف يُبنى في الخلفية بعد طلب المستخدم، ثم يبقى جاهزاً حتى تتغير البيانات
+        if st.button("📦 تجهيز ملف الجرد الكامل"):
+            st.session_state['full_export'] = (data_versions, export_format,
+                                               submit_export_job(data_versions, export_format))
+        full_export = st.session_state.get('full_export')
+        if full_export and full_export[:2] == (data_versions, export_format):
+            # اسم الملف مع التاريخ
+            today = datetime.now().strftime("%Y-%m-%d")
+            show_export_job(full_export[2], "📥 تحميل ملف الجرد الكامل", f"جرد_المخزن_{today}")
     
     # عرض البيانات حسب اليوم المحدد
-    if selected_day_en and not sales_df.empty:
-        # إنشاء نسخة من البيانات لتجنب تعديل الأصلية
-        sales_df_filtered = sales_df.copy()
-        # تحويل عمود التاريخ إلى datetime
-        sales_df_filtered['التاريخ'] = pd.to_datetime(sales_df_filtered['التاريخ'])
+    has_sales = store.sales_totals()[0] > 0
+    if selected_day_en and has_sales:
+        # إحصائيات اليوم (من التجميعات المسبقة)
+        day_count, day_meters = store.sales_by_weekday(selected_day_en)
         
-        # تصفية البيانات حسب اليوم المحدد
-        filtered_sales = sales_df_filtered[sales_df_filtered['التاريخ'].dt.day_name() == selected_day_en].copy()
-        
-        if not filtered_sales.empty:
+        if day_count:
             st.info(f"📊 بيانات يوم {selected_day_ar}")
             
-            # إحصائيات اليوم
             col_stat1, col_stat2, col_stat3 = st.columns(3)
             with col_stat1:
-                st.metric("عدد المعاملات", len(filtered_sales))
+                st.metric("عدد المعاملات", day_count)
             with col_stat2:
-                st.metric("إجمالي الأمتار المباعة", f"{filtered_sales['أمتار'].sum():,.1f} م")
+                st.metric("إجمالي الأمتار المباعة", f"{day_meters:,.1f} م")
             with col_stat3:
-                st.metric("عدد الأصناف", filtered_sales['الصنف'].nunique())
+                st.metric("عدد الأصناف", store.sales_summary(weekday=selected_day_en)[2])
             
             # جدول المبيعات لليوم المحدد
             st.subheader(f"📋 تفاصيل مبيعات {selected_day_ar}")
-            st.dataframe(filtered_sales[['التاريخ', 'الصنف', 'أمتار']], use_container_width=True)
+            filters = sales_filters('day_sales')
+            show_paginated_table('day_sales', store.query_sales, weekday=selected_day_en, **filters)
             
-            # زر تحميل بيانات اليوم
-            output_day = BytesIO()
-            filtered_sales[['التاريخ', 'الصنف', 'أمتار']].to_excel(output_day, index=False, engine='openpyxl')
-            output_day.seek(0)
-            filename_day = f"مبيعات_{selected_day_ar}_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
-            st.download_button(
-                label=f"📥 تحميل بيانات {selected_day_ar}",
-                data=output_day.getvalue(),
-                file_name=filename_day,
-                mime="application/vnd.openpyxl-officedocument.spreadsheetml.sheet"
-            )
+            # زر تحميل بيانات اليوم (يُجهز عند الطلب فقط)
+            day_export_key = (data_versions, selected_day_en, export_format)
+            if st.button(f"📦 تجهيز ملف {selected_day_ar}"):
+                st.session_state['day_export'] = (
+                    day_export_key, submit_export_job(data_versions, export_format, selected_day_en))
+            day_export = st.session_state.get('day_export')
+            if day_export and day_export[0] == day_export_key:
+                show_export_job(day_export[1], f"📥 تحميل بيانات {selected_day_ar}",
+                                f"مبيعات_{selected_day_ar}_{datetime.now().strftime('%Y-%m-%d')}")
         else:
             st.warning(f"لا توجد بيانات مبيعات ليوم {selected_day_ar}")
     else:
-        if not sales_df.empty and selected_day_ar == 'الكل':
+        if has_sales and selected_day_ar == 'الكل':
             st.info("📊 عرض جميع بيانات المبيعات")
-            st.dataframe(sales_df, use_container_width=True)
+            filters = sales_filters('all_sales')
+            show_paginated_table('all_sales', store.query_sales, **filters)
     
     st.divider()
     st.subheader("📋 حالة الجرد الحالي")
-    st.dataframe(inv_df, use_container_width=True)
+    inventory_search = st.text_input("🔍 بحث في الأصناف:", key="inventory_search")
+    show_paginated_table('inventory', store.query_inventory, search=inventory_search or None)
 
 # --- الصفحة الثانية: الإحصائيات المتقدمة ---
 elif page == "📊 صفحة الإحصائيات المتقدمة":
+    import plotly.express as px # للمخططات الجمالية (تُحمل في هذه الصفحة فقط)
+    
     st.header("📊 تحليل مبيعات الأمتار")
     
-    if not sales_df.empty:
+    # التجميعات المسبقة تُحدّث مع كل حركة، فلا حاجة لتجميع سجل المبيعات كاملاً هنا
+    best_sellers = store.sales_by_item()
+    if not best_sellers.empty:
         # مؤشرات سريعة
         c1, c2, c3 = st.columns(3)
         with c1:
-            st.metric("إجمالي الأمتار المباعة", f"{sales_df['أمتار'].sum():,.1f} م")
+            st.metric("إجمالي الأمتار المباعة", f"{best_sellers['أمتار'].sum():,.1f} م")
         with c2:
-            st.metric("أكثر صنف مبيعاً", sales_df.groupby('الصنف')['أمتار'].sum().idxmax())
+            st.metric("أكثر صنف مبيعاً", best_sellers['الصنف'].iloc[0])
         with c3:
-            st.metric("عدد عمليات اليوم", len(sales_df[pd.to_datetime(sales_df['التاريخ']).dt.date == pd.Timestamp.now().date()]))
+            st.metric("عدد عمليات اليوم", store.sales_by_day(pd.Timestamp.now().date())[0])
 
         # مخطط بياني جمالي للأصناف الأكثر مبيعاً
         st.subheader("🔝 الأصناف الأكثر طلباً (حسب الأمتار)")
-        best_sellers = sales_df.groupby('الصنف')['أمتار'].sum().reset_index().sort_values(by='أمتار', ascending=False)
-        fig = px.bar(best_sellers.head(10), x='الصنف', y='أمتار', color='أمتار', color_continuous_scale='Reds', template="plotly_dark")
-        st.plotly_chart(fig, use_container_width=True)
+        with metrics.timer('render.best_sellers_chart'):
+            fig = px.bar(best_sellers.head(10), x='الصنف', y='أمتار', color='أمتار', color_continuous_scale='Reds', template="plotly_dark")
+            st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("لا توجد بيانات مبيعات لعرض الإحصائيات بعد.")
 
 # --- الصفحة الثالثة: قراءة فواتير PDF ---
 elif page == "📄 قراءة فواتير PDF":
+    inv_df = get_loader().inventory()
     st.header("📄 قراءة فواتير PDF - شركة مجال")
     
     st.info("💡 يمكنك رفع ملف أو أكثر من ملف PDF لقراءة الفواتير واستخراج المنتجات تلقائياً")
@@ -374,18 +331,47 @@ elif page == "📄 قراءة فواتير PDF":
     if uploaded_pdfs:
         st.success(f"تم رفع {len(uploaded_pdfs)} ملف PDF")
         
-        # معالجة الملفات
+        # معالجة الملفات في الخلفية (الصفحة تبقى متاحة أثناء القراءة)
         if st.button("🔍 استخراج البيانات من الفواتير", type="primary"):
-            with st.spinner("جاري معالجة الفواتير..."):
-                extracted_data = process_pdf_invoices(uploaded_pdfs, inv_df)
-                
-                if extracted_data:
-                    # حفظ البيانات في session state
-                    st.session_state['extracted_invoice_data'] = extracted_data
-                    st.success(f"تم استخراج {len(extracted_data)} منتج من الفواتير")
-                else:
-                    st.warning("لم يتم العثور على منتجات في الفواتير المرفوعة")
-                    st.session_state['extracted_invoice_data'] = []
+            invoice_job_id = submit_invoice_job(uploaded_pdfs)
+            if invoice_job_id == st.session_state.get('invoice_job_loaded'):
+                st.info("هذه الفواتير قُرئت من قبل: تُعرض النتيجة المحفوظة مرة أخرى")
+            st.session_state['invoice_job'] = invoice_job_id
+            # طلب الاستخراج يعرض النتيجة دائماً حتى لو كانت نفس المهمة التي حُملت من قبل
+            st.session_state.pop('invoice_job_loaded', None)
+    
+    # متابعة مهمة الفواتير الحالية، وتحميل نتيجتها مرة واحدة عند الانتهاء
+    job_queue = get_job_queue()
+    invoice_job_id = st.session_state.get('invoice_job')
+    invoice_job = job_queue.get(invoice_job_id) if invoice_job_id is not None else None
+    if invoice_job and invoice_job['status'] in ACTIVE:
+        job_progress(invoice_job_id)
+    elif invoice_job and st.session_state.get('invoice_job_loaded') != invoice_job_id:
+        st.session_state['invoice_job_loaded'] = invoice_job_id
+        if invoice_job['status'] == FAILED:
+            st.error(f"خطأ في معالجة الفواتير: {invoice_job['error']}")
+        else:
+            for file_name, error in invoice_job['result']['errors']:
+                st.error(f"خطأ في قراءة ملف PDF ({file_name}): {error}")
+            extracted_data = invoice_job['result']['lines']
+            # حفظ البيانات في session state
+            st.session_state['extracted_invoice_data'] = extracted_data
+            if extracted_data:
+                st.success(f"تم استخراج {len(extracted_data)} منتج من الفواتير")
+            else:
+                st.warning("لم يتم العثور على منتجات في الفواتير المرفوعة")
+    
+    # المهام السابقة من جميع الجلسات (النتيجة تبقى متاحة بعد انقطاع الاتصال)
+    recent_jobs = job_queue.recent('invoices', limit=5)
+    if recent_jobs:
+        with st.expander("🕒 آخر مهام قراءة الفواتير"):
+            for job in recent_jobs:
+                created = datetime.fromtimestamp(job['created']).strftime('%Y-%m-%d %H:%M')
+                st.caption(f"{JOB_STATUS_LABELS[job['status']]} | {created} | {job['label']}")
+                if job['status'] == DONE and job['id'] != invoice_job_id:
+                    if st.button("📂 عرض النتيجة", key=f"show_invoice_job_{job['id']}"):
+                        st.session_state['invoice_job'] = job['id']
+                        st.rerun()
     
     # عرض البيانات المستخرجة
     if 'extracted_invoice_data' in st.session_state and st.session_state['extracted_invoice_data']:
@@ -394,22 +380,52 @@ elif page == "📄 قراءة فواتير PDF":
         
         extracted_data = st.session_state['extracted_invoice_data']
         
-        # إنشاء DataFrame للعرض
+        # إنشاء DataFrame للعرض (عمود الصنف المطابق قابل للتصحيح)
         display_data = []
         for item in extracted_data:
             status = "✅ متطابق" if item['matched_name'] else "❌ غير متطابق"
             match_percentage = f"{item['match_score']*100:.1f}%"
             display_data.append({
                 'اسم المنتج في الفاتورة': item['original_name'],
-                'اسم المنتج المطابق': item['matched_name'] if item['matched_name'] else 'غير موجود',
+                'اسم المنتج المطابق': item['matched_name'],
                 'الكمية': item['quantity'],
                 'نسبة التطابق': match_percentage,
+                'طريقة المطابقة': MATCH_SOURCE_LABELS.get(item.get('match_source'), ''),
                 'الحالة': status,
                 'اسم الملف': item['file_name']
             })
         
         df_display = pd.DataFrame(display_data)
-        st.dataframe(df_display, use_container_width=True)
+        st.caption("✏️ يمكن تصحيح الصنف المطابق من الجدول، ويُحفظ التصحيح لنفس الاسم في الفواتير القادمة")
+        review_round = st.session_state.get('invoice_review_round', 0)
+        df_edited = st.data_editor(
+            df_display,
+            key=f"invoice_review_{review_round}",
+            use_container_width=True,
+            disabled=[column for column in df_display.columns if column != 'اسم المنتج المطابق'],
+            column_config={
+                'اسم المنتج المطابق': st.column_config.SelectboxColumn(
+                    options=inventory_options(store.names_version()), required=False),
+            },
+        )
+        
+        # تطبيق التصحيحات على كل أسطر نفس الاسم وحفظها كأسماء متعلمة
+        matched_column = df_edited['اسم المنتج المطابق']
+        edited_names = matched_column.astype(object).where(matched_column.notna(), None)
+        corrections = {
+            item['original_name']: new_name or None
+            for item, new_name in zip(extracted_data, edited_names)
+            if (new_name or None) != item['matched_name']
+        }
+        if corrections:
+            for item in extracted_data:
+                if item['original_name'] in corrections:
+                    new_name = corrections[item['original_name']]
+                    item.update(matched_name=new_name, match_score=1.0 if new_name else 0.0, match_source='manual')
+            store.learn_aliases([(name, item) for name, item in corrections.items() if item], source='manual')
+            store.forget_aliases([name for name, item in corrections.items() if not item])
+            st.session_state['invoice_review_round'] = review_round + 1
+            st.rerun()
         
         # تصفية المنتجات المتطابقة فقط
         matched_items = [item for item in extracted_data if item['matched_name']]
@@ -418,22 +434,21 @@ elif page == "📄 قراءة فواتير PDF":
             st.divider()
             st.subheader("✅ المنتجات الجاهزة للخصم من المخزن")
             
-            # جدول للمنتجات المتطابقة
-            matched_display = []
-            for item in matched_items:
-                # التحقق من الكمية المتوفرة
-                inv_idx = inv_df[inv_df['الصنف'] == item['matched_name']].index
-                available_qty = inv_df.at[inv_idx[0], 'المتبقي'] if len(inv_idx) > 0 else 0
-                can_deduct = available_qty >= item['quantity']
-                
-                matched_display.append({
-                    'الصنف': item['matched_name'],
-                    'الكمية المطلوبة': item['quantity'],
-                    'المتاح في المخزن': available_qty,
-                    'الحالة': '✅ متوفر' if can_deduct else '❌ غير كافي'
-                })
+            # التحقق من الكمية المتوفرة لكل الأسطر دفعة واحدة (اسم الصنف -> المتبقي)
+            remaining_by_name = inv_df.drop_duplicates('الصنف').set_index('الصنف')['المتبقي']
+            plan = plan_batch_deduction(
+                [item['matched_name'] for item in matched_items],
+                [item['quantity'] for item in matched_items],
+                remaining_by_name
+            )
             
-            df_matched = pd.DataFrame(matched_display)
+            # جدول للمنتجات المتطابقة
+            df_matched = pd.DataFrame({
+                'الصنف': plan['item'],
+                'الكمية المطلوبة': plan['quantity'],
+                'المتاح في المخزن': plan['available'],
+                'الحالة': plan['deductible'].map({True: '✅ متوفر', False: '❌ غير كافي'})
+            })
             st.dataframe(df_matched, use_container_width=True)
             
             # زر التأكيد
@@ -445,37 +460,26 @@ elif page == "📄 قراءة فواتير PDF":
             
             with col_confirm2:
                 if st.button("✅ تأكيد الخصم من المخزن", type="primary", use_container_width=True):
-                    # تحديث المخزن والمبيعات
+                    # تحديث المخزن والمبيعات لكل الأسطر في معاملة واحدة
                     success_count = 0
                     error_count = 0
                     
-                    for item in matched_items:
-                        try:
-                            inv_idx = inv_df[inv_df['الصنف'] == item['matched_name']].index[0]
-                            
-                            if inv_df.at[inv_idx, 'المتبقي'] >= item['quantity']:
-                                # خصم من المخزن
-                                inv_df.at[inv_idx, 'المتبقي'] -= item['quantity']
-                                success_count += 1
-                                
-                                # تسجيل في المبيعات
-                                new_sale = pd.DataFrame([{
-                                    'التاريخ': pd.Timestamp.now(),
-                                    'الصنف': item['matched_name'],
-                                    'أمتار': item['quantity'],
-                                    'ملاحظة': 'تم الإدخال عبر فاتورة PDF'
-                                }])
-                                sales_df = pd.concat([sales_df, new_sale], ignore_index=True)
-                            else:
-                                error_count += 1
-                        except Exception as e:
-                            error_count += 1
-                            st.error(f"خطأ في معالجة {item['matched_name']}: {e}")
+                    try:
+                        result = store.deduct_batch(
+                            [item['matched_name'] for item in matched_items],
+                            [item['quantity'] for item in matched_items],
+                            'تم الإدخال عبر فاتورة PDF'
+                        )
+                        success_count = int(result['deductible'].sum())
+                        error_count = len(result) - success_count
+                        # المطابقات التقريبية المؤكدة بالخصم تُحفظ كأسماء متعلمة
+                        from warehouse.ingest import learn_from_deductions
+                        learn_from_deductions(store, [item for item, deducted in
+                                                      zip(matched_items, result['deductible']) if deducted])
+                    except Exception as e:
+                        st.error(f"خطأ في خصم الفاتورة (لم يتم خصم أي منتج): {e}")
                     
-                    # حفظ التغييرات
                     if success_count > 0:
-                        inv_df.to_csv('inventory.csv', index=False)
-                        sales_df.to_csv('sales.csv', index=False)
                         st.success(f"✅ تم خصم {success_count} منتج بنجاح!")
                         if error_count > 0:
                             st.warning(f"⚠️ {error_count} منتج لم يتم خصمه (كمية غير كافية)")
@@ -491,22 +495,122 @@ elif page == "📄 قراءة فواتير PDF":
 # --- الصفحة الرابعة: الإعدادات والرفع ---
 elif page == "⚙️ الإعدادات والرفع":
     st.header("⚙️ إدارة البيانات")
+    skipped_sales = store.skipped_csv_sales()
+    if skipped_sales:
+        st.warning(f"⚠️ تم تخطي {skipped_sales} حركة من sales.csv القديم عند الترحيل لأن تاريخها غير صالح")
     
     st.subheader("📥 رفع ملف إكسل النواقية الرئيسي")
     uploaded_file = st.file_uploader("اختر ملف Excel يحتوي على (الصنف، الكمية)", type=['xlsx'])
+    st.caption("الأصناف الجديدة تُضاف، والموجودة تتغير كميتها الافتتاحية ويتغير المتبقي بنفس الفرق، "
+               "وباقي الأصناف لا تتغير.")
     
-    if uploaded_file:
+    if uploaded_file and st.button("📥 دمج الملف مع المخزن"):
+        from warehouse.importer import import_inventory_workbook
+
+        progress = st.progress(0.0, text="جاري قراءة الملف...")
+
+        def update_progress(done, total):
+            fraction = min(done / total, 1.0) if total else 0.0
+            progress.progress(fraction, text=f"تمت قراءة {done:,} صف")
+
         try:
-            raw_data = pd.read_excel(uploaded_file)
-            raw_data.columns = ['الصنف', 'الافتتاحي']
-            raw_data['المتبقي'] = raw_data['الافتتاحي']
-            raw_data.to_csv('inventory.csv', index=False)
-            st.success("✅ تم تحديث المخزن الرئيسي بنجاح!")
+            report = import_inventory_workbook(store, uploaded_file, update_progress)
         except Exception as e:
-            st.error(f"خطأ في شكل الملف: {e}")
+            progress.empty()
+            st.error(f"خطأ في شكل الملف (لم يتغير المخزن): {e}")
+        else:
+            progress.empty()
+            st.session_state['inventory_import_report'] = report
+
+    report = st.session_state.get('inventory_import_report')
+    if report:
+        st.success(f"✅ تم دمج الملف: {report['added']:,} صنف جديد، {report['updated']:,} صنف معدل، "
+                   f"{report['unchanged']:,} بدون تغيير")
+        if report['duplicates']:
+            st.info(f"ℹ️ {report['duplicates']:,} صف لأصناف مكررة في الملف (تم جمع كمياتها)")
+        if report['clamped']:
+            st.warning(f"⚠️ {report['clamped']:,} صنف كميته الجديدة أقل من المبيع منه، فأصبح المتبقي صفراً")
+        if report['invalid']:
+            with st.expander(f"❌ {report['invalid']:,} صف غير صالح (تم تخطيها)"):
+                st.dataframe(pd.DataFrame(report['errors']), use_container_width=True, hide_index=True)
+
+    st.divider()
+    st.subheader("📤 تصدير البيانات")
+    if st.checkbox("تجهيز ملفات CSV للتحميل"):
+        col_csv1, col_csv2 = st.columns(2)
+        with col_csv1:
+            inv_csv = StringIO()
+            store.export_inventory_csv(inv_csv)
+            st.download_button("📥 تحميل inventory.csv", data=inv_csv.getvalue().encode('utf-8'), file_name="inventory.csv", mime="text/csv")
+        with col_csv2:
+            sales_csv = StringIO()
+            store.export_sales_csv(sales_csv)
+            st.download_button("📥 تحميل sales.csv", data=sales_csv.getvalue().encode('utf-8'), file_name="sales.csv", mime="text/csv")
+
+    st.divider()
+    st.subheader("🗂️ ذاكرة نتائج الفواتير")
+    cache_stats = get_result_cache().stats()
+    st.caption(f"{cache_stats['entries']} نتيجة محفوظة ({cache_stats['bytes'] / 1024 / 1024:.1f} من {cache_stats['max_bytes'] / 1024 / 1024:.0f} ميجابايت)")
+    if st.button("🧹 مسح ذاكرة الفواتير"):
+        get_result_cache().clear()
+        st.rerun()
+
+    st.divider()
+    st.subheader("🧠 أسماء الموردين المتعلمة")
+    match_counts, aliases_df = store.alias_stats()
+    total_lines = sum(match_counts.values())
+    col_a1, col_a2, col_a3 = st.columns(3)
+    with col_a1:
+        st.metric("الأسماء المتعلمة", f"{len(aliases_df):,}")
+    with col_a2:
+        st.metric("أسطر طابقها اسم متعلم", f"{match_counts.get('alias', 0) / total_lines:.0%}" if total_lines else "-")
+    with col_a3:
+        st.metric("أسطر احتاجت مطابقة تقريبية",
+                  f"{(match_counts.get('fuzzy', 0) + match_counts.get('none', 0)) / total_lines:.0%}" if total_lines else "-")
+    st.caption(f"من {total_lines:,} سطر فاتورة. الأسماء تُتعلم من الخصم المؤكد ومن التصحيح اليدوي في صفحة الفواتير.")
+    if not aliases_df.empty:
+        st.dataframe(aliases_df.rename(columns={
+            'alias': 'الاسم في الفاتورة', 'item': 'الصنف', 'source': 'المصدر', 'hits': 'مرات الاستخدام',
+            'updated': 'آخر تعديل', 'last_used': 'آخر استخدام',
+        }), use_container_width=True, hide_index=True)
+
+    st.divider()
+    st.subheader("⏱️ قياس أداء العمليات")
+    st.toggle("تفعيل القياس (لكل الجلسات حتى إعادة تشغيل الخادم)", value=metrics.is_enabled(), key='metrics_enabled',
+              on_change=lambda: metrics.set_enabled(st.session_state['metrics_enabled']))
+    metrics_data = metrics.snapshot()
+    if metrics_data['stages']:
+        st.dataframe(pd.DataFrame([
+            {
+                'المرحلة': stage,
+                'العدد': values['count'],
+                'المتوسط (مللي ث)': values['mean'] * 1000,
+                'p50 (مللي ث)': values['p50'] * 1000,
+                'p95 (مللي ث)': values['p95'] * 1000,
+                'الأقصى (مللي ث)': values['max'] * 1000,
+                'الإجمالي (ث)': values['sum'],
+            }
+            for stage, values in metrics_data['stages'].items()
+        ]).round(2), use_container_width=True, hide_index=True)
+    elif metrics.is_enabled():
+        st.caption("لا توجد قياسات بعد، استخدم التطبيق ثم عد إلى هذه الصفحة.")
+    else:
+        st.caption("القياس معطل (يمكن تفعيله أيضاً بمتغير البيئة WAREHOUSE_METRICS=1).")
+    if metrics_data['counters']:
+        st.caption(" | ".join(f"{name}: {value:,}" for name, value in metrics_data['counters'].items()))
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.download_button("📥 القياسات (JSON)", data=metrics.to_json().encode('utf-8'), file_name="metrics.json", mime="application/json")
+    with col_m2:
+        st.download_button("📥 القياسات (Prometheus)", data=metrics.to_prometheus().encode('utf-8'), file_name="metrics.prom", mime="text/plain")
+    with col_m3:
+        if st.button("🧹 مسح القياسات"):
+            metrics.reset()
+            st.rerun()
 
     st.divider()
     if st.button("⚠️ مسح جميع البيانات وابدأ من جديد"):
+        store.reset()
         if os.path.exists('inventory.csv'): os.remove('inventory.csv')
         if os.path.exists('sales.csv'): os.remove('sales.csv')
         st.rerun()
\ No newline at end of file
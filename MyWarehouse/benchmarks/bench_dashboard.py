@@ -0,0 +1,70 @@
+"""قياس زمن عرض لوحة التحكم (حتى تصبح الصفحة جاهزة للتفاعل) مع سجل مبيعات كبير
+
+يُنشئ مجلداً مؤقتاً فيه inventory.csv و sales.csv صناعي ثم يشغل app.py عبر AppTest
+(يشمل ذلك تحويل الجداول إلى Arrow كما يحدث قبل إرسالها للمتصفح).
+
+التشغيل من مجلد المشروع:
+    python benchmarks/bench_dashboard.py [عدد_حركات_المبيعات] [عدد_مرات_الإعادة] [مسار_app.py]
+
+يمكن تمرير مسار app.py من نسخة أخرى من المشروع (git worktree) للمقارنة قبل وبعد التغيير.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(directory, sales_rows):
+    inventory = pd.read_csv(os.path.join(ROOT, 'inventory.csv'))
+    shutil.copy(os.path.join(ROOT, 'inventory.csv'), directory)
+    names = inventory['الصنف'].astype(str).tolist()
+    pd.DataFrame({
+        'التاريخ': pd.date_range('2023-01-01', periods=sales_rows, freq='min').astype(str),
+        'الصنف': [names[i % len(names)] for i in range(sales_rows)],
+        'أمتار': 1.5,
+        'ملاحظة': '',
+    }).to_csv(os.path.join(directory, 'sales.csv'), index=False)
+
+
+def main():
+    from streamlit.testing.v1 import AppTest
+
+    sales_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    reruns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    app_path = os.path.abspath(sys.argv[3]) if len(sys.argv) > 3 else os.path.join(ROOT, 'app.py')
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(tmp, sales_rows)
+        os.chdir(tmp)
+        try:
+            app = AppTest.from_file(app_path, default_timeout=600)
+            start = time.perf_counter()
+            app.run()
+            first = time.perf_counter() - start
+            if app.exception:
+                raise SystemExit(app.exception)
+
+            times = []
+            for _ in range(reruns):
+                start = time.perf_counter()
+                app.run()
+                times.append(time.perf_counter() - start)
+            # حجم بيانات الجداول المرسلة إلى المتصفح في آخر عرض
+            payload = sum(len(table.proto.arrow_data.data) for table in app.dataframe)
+        finally:
+            os.chdir(cwd)
+
+    print(f"المبيعات: {sales_rows:,} حركة")
+    print(f"أول عرض (يشمل تحميل البيانات): {first:.3f} ث")
+    print(f"إعادة العرض: متوسط {sum(times) / len(times):.3f} ث | أقل {min(times):.3f} ث")
+    print(f"بيانات الجداول المرسلة للمتصفح: {payload / 1024:,.0f} كيلوبايت")
+
+
+if __name__ == '__main__':
+    main()
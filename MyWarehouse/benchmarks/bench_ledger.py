@@ -0,0 +1,61 @@
+"""قياس تكلفة تسجيل عملية سحب واحدة: إعادة كتابة sales.csv مقابل الإضافة في قاعدة البيانات
+
+التشغيل من مجلد المشروع:
+    python benchmarks/bench_ledger.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from warehouse.store import WarehouseStore  # noqa: E402
+
+HISTORY_SIZES = [1_000, 10_000, 100_000]
+SALES_PER_RUN = 20
+
+
+def make_history(size, names):
+    return pd.DataFrame({
+        'التاريخ': pd.date_range('2024-01-01', periods=size, freq='min').astype(str),
+        'الصنف': [names[i % len(names)] for i in range(size)],
+        'أمتار': 1.5,
+        'ملاحظة': '',
+    })
+
+
+def main():
+    inventory = pd.read_csv(os.path.join(ROOT, 'inventory.csv'))
+    names = inventory['الصنف'].astype(str).tolist()
+    item = names[0]
+
+    for size in HISTORY_SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            inv_path = os.path.join(tmp, 'inventory.csv')
+            sales_path = os.path.join(tmp, 'sales.csv')
+            inventory.to_csv(inv_path, index=False)
+            make_history(size, names).to_csv(sales_path, index=False)
+
+            # الطريقة القديمة: قراءة السجل كاملاً ثم إعادة كتابته لكل عملية
+            start = time.perf_counter()
+            for _ in range(SALES_PER_RUN):
+                sales_df = pd.read_csv(sales_path)
+                new_row = pd.DataFrame([{'التاريخ': pd.Timestamp.now(), 'الصنف': item, 'أمتار': 0.1, 'ملاحظة': ''}])
+                pd.concat([sales_df, new_row]).to_csv(sales_path, index=False)
+            csv_time = (time.perf_counter() - start) / SALES_PER_RUN
+
+            store = WarehouseStore(os.path.join(tmp, 'warehouse.db'), inv_path, sales_path)
+            start = time.perf_counter()
+            for _ in range(SALES_PER_RUN):
+                store.record_sale(item, 0.1)
+            store_time = (time.perf_counter() - start) / SALES_PER_RUN
+
+        print(f"السجل {size:>8,} حركة | CSV: {csv_time * 1000:9.2f} مللي ث | قاعدة البيانات: {store_time * 1000:7.2f} مللي ث")
+
+
+if __name__ == '__main__':
+    main()
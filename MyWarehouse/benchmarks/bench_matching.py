@@ -0,0 +1,68 @@
+"""مقارنة سرعة ودقة المطابقة القديمة (بحث خطي) مع فهرس المطابقة الجديد
+
+التشغيل من مجلد المشروع:
+    python benchmarks/bench_matching.py [عدد_الأسطر]
+"""
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import noisy_name  # noqa: E402
+from warehouse.matching import ProductMatcher  # noqa: E402
+
+
+def legacy_match(product_name, names, threshold=0.6):
+    """نسخة من match_product_with_inventory قبل إضافة الفهرس"""
+    best_match = None
+    best_score = 0
+    for inv_product in names:
+        score = SequenceMatcher(None, str(product_name).lower().strip(), str(inv_product).lower().strip()).ratio()
+        if score > best_score:
+            best_score = score
+            best_match = inv_product
+    if best_score >= threshold:
+        return best_match, best_score
+    return None, best_score
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    inventory = pd.read_csv(os.path.join(ROOT, 'inventory.csv'))
+    names = inventory['الصنف'].astype(str).tolist()
+    rng = random.Random(42)
+    queries = [noisy_name(rng.choice(names), rng) for _ in range(lines)]
+
+    start = time.perf_counter()
+    legacy = [legacy_match(q, names) for q in queries]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = ProductMatcher(names)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [matcher.match(q) for q in queries]
+    indexed_time = time.perf_counter() - start
+
+    same_name = sum(1 for a, b in zip(legacy, indexed) if a[0] == b[0])
+    same_decision = sum(1 for a, b in zip(legacy, indexed) if (a[0] is None) == (b[0] is None))
+    max_score_diff = max(abs(a[1] - b[1]) for a, b in zip(legacy, indexed))
+
+    print(f"الأصناف: {len(names)} | أسطر الفاتورة: {lines}")
+    print(f"البحث الخطي:   {legacy_time:8.3f} ث ({legacy_time / lines * 1000:.2f} مللي ث/سطر)")
+    print(f"بناء الفهرس:   {build_time:8.3f} ث")
+    print(f"الفهرس:        {indexed_time:8.3f} ث ({indexed_time / lines * 1000:.2f} مللي ث/سطر)")
+    print(f"التسريع:       {legacy_time / indexed_time:8.1f}x")
+    print(f"نفس الصنف المطابق: {same_name}/{lines} | نفس قرار الحد 0.6: {same_decision}/{lines}")
+    print(f"أكبر فرق في الدرجة: {max_score_diff:.4f}")
+
+
+if __name__ == '__main__':
+    main()
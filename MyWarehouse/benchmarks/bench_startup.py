@@ -0,0 +1,87 @@
+"""قياس زمن الاستيراد وزمن أول عرض لكل صفحة (كل قياس في عملية Python جديدة)
+
+التشغيل من مجلد المشروع:
+    python benchmarks/bench_startup.py [مسار_app.py]
+
+يمكن تمرير مسار app.py من نسخة أخرى من المشروع (git worktree) للمقارنة قبل وبعد التغيير.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['streamlit', 'pandas', 'plotly.express', 'pdfplumber', 'openpyxl']
+PAGES = ["🏠 لوحة التحكم والجرد", "📊 صفحة الإحصائيات المتقدمة", "📄 قراءة فواتير PDF", "⚙️ الإعدادات والرفع"]
+RERUNS = 3
+
+# يُنفذ داخل عملية جديدة: زمن استيراد وحدة واحدة
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+# يُنفذ داخل عملية جديدة: أول عرض لصفحة ثم متوسط إعادة العرض
+RENDER_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app_path, page = sys.argv[1], sys.argv[2]
+app = AppTest.from_file(app_path, default_timeout=600)
+app.session_state['page'] = page
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(str(app.exception))
+# النسخ القديمة بدون مفتاح للقائمة الجانبية: اختيار الصفحة بعد أول تشغيل
+if app.sidebar.radio and app.sidebar.radio[0].value != page:
+    start = time.perf_counter()
+    app.sidebar.radio[0].set_value(page).run()
+    first = time.perf_counter() - start
+times = []
+for _ in range(%d):
+    start = time.perf_counter()
+    app.run()
+    times.append(time.perf_counter() - start)
+print(json.dumps({'first': first, 'rerun': sum(times) / len(times), 'modules': sorted(
+    m for m in ('plotly.express', 'pdfplumber', 'openpyxl') if m in sys.modules)}))
+""" % RERUNS
+
+
+def measure_import(module):
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET, module],
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_page(app_path, page, workdir):
+    output = subprocess.run([sys.executable, '-c', RENDER_SNIPPET, app_path, page],
+                            capture_output=True, text=True, check=True, cwd=workdir).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    app_path = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.join(ROOT, 'app.py')
+
+    print("زمن الاستيراد (عملية جديدة لكل وحدة):")
+    for module in MODULES:
+        print(f"  {module:<16} {measure_import(module) * 1000:8.0f} مللي ث")
+
+    print("أول عرض وإعادة العرض لكل صفحة:")
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(ROOT, 'inventory.csv'), tmp)
+        # تشغيل أول لإنشاء قاعدة البيانات حتى لا يُحسب الترحيل من CSV ضمن زمن الصفحات
+        measure_page(app_path, PAGES[-1], tmp)
+        for page in PAGES:
+            result = measure_page(app_path, page, tmp)
+            print(f"  {page:<32} أول عرض {result['first'] * 1000:7.0f} مللي ث | "
+                  f"إعادة {result['rerun'] * 1000:6.0f} مللي ث | وحدات محملة: {', '.join(result['modules']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""قياس زمن تحميل سجل مبيعات كبير والذاكرة المستخدمة حسب طريقة التخزين
+
+كل طريقة تُقاس في عملية Python جديدة (الذاكرة = زيادة RSS بعد تحميل جدولي المخزن والمبيعات، Linux):
+  csv       قراءة inventory.csv و sales.csv بـ pandas (الطريقة الأصلية)
+  sqlite    قراءة كل الأصناف والحركات من قاعدة البيانات
+  snapshot  أول تحميل عبر DataLoader (يُنشئ لقطة Arrow من قاعدة البيانات)
+  mmap      تحميل لاحق في عملية جديدة من اللقطة المعينة في الذاكرة
+
+التشغيل من مجلد المشروع:
+    python benchmarks/bench_storage.py [عدد_الأصناف] [عدد_حركات_المبيعات]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import make_inventory, make_sales  # noqa: E402
+
+# يُنفذ داخل عملية جديدة: تحميل المخزن والسجل بطريقة واحدة
+LOAD_SNIPPET = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+import pandas as pd
+import pyarrow
+from warehouse.loader import DataLoader, type_inventory, type_sales
+from warehouse.store import WarehouseStore
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+method, directory = sys.argv[2], sys.argv[3]
+store = WarehouseStore(directory + '/warehouse.db', None, None)
+base = rss_mb()
+start = time.perf_counter()
+if method == 'csv':
+    frames = (type_inventory(pd.read_csv(directory + '/inventory.csv')),
+              type_sales(pd.read_csv(directory + '/sales.csv')))
+elif method == 'sqlite':
+    frames = (type_inventory(store.inventory_frame()), type_sales(store.sales_frame()))
+else:
+    frames = DataLoader(store).frames()
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss_mb() - base}))
+"""
+
+
+def measure(method, directory):
+    output = subprocess.run([sys.executable, '-c', LOAD_SNIPPET, ROOT, method, directory],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    from warehouse.store import WarehouseStore
+
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    sales_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inventory = make_inventory(items)
+        inventory.to_csv(os.path.join(tmp, 'inventory.csv'), index=False)
+        make_sales(inventory['الصنف'].tolist(), sales_rows).to_csv(os.path.join(tmp, 'sales.csv'), index=False)
+        del inventory
+
+        start = time.perf_counter()
+        store = WarehouseStore(os.path.join(tmp, 'warehouse.db'),
+                               os.path.join(tmp, 'inventory.csv'), os.path.join(tmp, 'sales.csv'))
+        import_time = time.perf_counter() - start
+        # نقل سجل WAL إلى الملف الرئيسي حتى يكون حجم قاعدة البيانات دقيقاً
+        store._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        print(f"الأصناف: {items:,} | المبيعات: {sales_rows:,} حركة")
+        print(f"ترحيل CSV إلى قاعدة البيانات: {import_time:.2f} ث")
+        print("تحميل المخزن والمبيعات:")
+        for method in ('csv', 'sqlite', 'snapshot', 'mmap'):
+            result = measure(method, tmp)
+            print(f"  {method:<9} {result['seconds']:8.3f} ث | ذاكرة إضافية {result['rss_mb']:8.1f} ميجابايت")
+
+        sizes = {name: os.path.getsize(os.path.join(tmp, name)) / 1024 / 1024
+                 for name in ('sales.csv', 'warehouse.db', 'warehouse.db.sales.arrow')
+                 if os.path.exists(os.path.join(tmp, name))}
+        print("أحجام الملفات: " + " | ".join(f"{name} {size:.1f} ميجابايت" for name, size in sizes.items()))
+
+
+if __name__ == '__main__':
+    main()
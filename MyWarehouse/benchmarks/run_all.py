@@ -0,0 +1,244 @@
+"""تشغيل كل قياسات الأداء على بيانات صناعية وحفظ النتائج في ملف JSON باسم نسخة git الحالية
+
+المسارات المقاسة: تحميل البيانات (ترحيل CSV وتحميل الجداول)، المطابقة، قراءة فواتير PDF،
+التجميعات والاستعلامات، التصدير، والخصم.
+
+التشغيل من مجلد المشروع:
+    python benchmarks/run_all.py                       # 2k/20k/200k صنف مع 10k/100k/1M حركة
+    python benchmarks/run_all.py --quick               # قياس سريع للتجربة
+    python benchmarks/run_all.py --compare benchmarks/results/<نسخة_سابقة>.json
+
+النتائج تُحفظ في benchmarks/results/<commit>.json (الأزمنة بالثواني، أفضل تشغيل من عدة مرات).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import (  # noqa: E402
+    make_inventory, make_invoice_pdf, make_sales, noisy_name, real_inventory_names)
+from warehouse.exports import full_inventory_export, sales_export  # noqa: E402
+from warehouse.invoices import process_invoice_files  # noqa: E402
+from warehouse.loader import DataLoader, type_sales  # noqa: E402
+from warehouse.matching import ProductMatcher  # noqa: E402
+from warehouse.store import WarehouseStore  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+MATCH_QUERIES = 200
+# قيم ليست أزمنة (لا يُحسب لها تسريع عند المقارنة)
+NOT_TIMES = ('match.accuracy', 'extract.recall', 'load.rss_mb', 'rss_mb')
+
+
+def measure(func, repeat=3):
+    """(أفضل زمن بالثواني، نتيجة آخر استدعاء)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_rss_mb():
+    """أقصى ذاكرة استخدمتها العملية بالميجابايت (None إذا تعذر قياسها)"""
+    if resource is not None:
+        # ru_maxrss بالبايت على macOS وبالكيلوبايت على Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, 'peak_wset', memory.rss) / 1024 / 1024
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '.'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_scenario(items, sales_rows, xlsx_max_rows, log):
+    """قياس مخزن بعدد items صنف وسجل بعدد sales_rows حركة"""
+    results = {}
+    inventory = make_inventory(items)
+    names = inventory['الصنف'].tolist()
+    sales = make_sales(names, sales_rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inventory_csv = os.path.join(tmp, 'inventory.csv')
+        sales_csv = os.path.join(tmp, 'sales.csv')
+        inventory.to_csv(inventory_csv, index=False)
+        sales.to_csv(sales_csv, index=False)
+        del sales
+
+        # --- التحميل ---
+        start = time.perf_counter()
+        store = WarehouseStore(os.path.join(tmp, 'warehouse.db'), inventory_csv, sales_csv)
+        results['load.csv_import'] = time.perf_counter() - start
+        log('load.csv_import', results['load.csv_import'])
+
+        loader = DataLoader(store)
+        results['load.frames_cold'], _ = measure(loader.frames, repeat=1)
+        results['load.frames_warm'], _ = measure(loader.frames)
+        results['load.rss_mb'] = peak_rss_mb()
+        log('load.frames_cold', results['load.frames_cold'])
+
+        # --- المطابقة ---
+        results['match.build_index'], matcher = measure(lambda: ProductMatcher(names), repeat=1)
+        rng = random.Random(42)
+        sources = [rng.choice(names) for _ in range(MATCH_QUERIES)]
+        queries = [noisy_name(name, rng) for name in sources]
+        elapsed, matches = measure(lambda: [matcher.match(query) for query in queries], repeat=1)
+        results['match.per_line'] = elapsed / len(queries)
+        results['match.accuracy'] = sum(
+            1 for (matched, _), source, query in zip(matches, sources, queries)
+            if matched == source or (matched is None and query.startswith('Unknown Item'))) / len(queries)
+        log('match.per_line', results['match.per_line'])
+
+        # --- التجميعات والاستعلامات ---
+        search = names[len(names) // 2].split()[0]
+        results['aggregate.sales_by_item'], _ = measure(store.sales_by_item)
+        results['aggregate.sales_by_weekday'], _ = measure(lambda: store.sales_by_weekday('Monday'))
+        results['aggregate.summary_search'], _ = measure(lambda: store.sales_summary(search=search))
+        results['aggregate.summary_range'], _ = measure(
+            lambda: store.sales_summary(date_from='2023-03-01', date_to='2023-05-31'))
+        results['aggregate.page_weekday'], _ = measure(lambda: store.query_sales(weekday='Monday', limit=50))
+        results['aggregate.page_search'], _ = measure(lambda: store.query_sales(search=search, limit=50))
+        log('aggregate.sales_by_item', results['aggregate.sales_by_item'])
+
+        # --- التصدير ---
+        inv_df, sales_df = loader.frames()
+        results['export.full_csv'], _ = measure(lambda: full_inventory_export(inv_df, sales_df, 'CSV'), repeat=1)
+        day_sales = type_sales(store.sales_frame(weekday='Monday'))
+        results['export.weekday_csv'], _ = measure(lambda: sales_export(day_sales, 'CSV'), repeat=1)
+        if len(inv_df) + len(sales_df) <= xlsx_max_rows:
+            results['export.full_xlsx'], _ = measure(lambda: full_inventory_export(inv_df, sales_df, 'Excel'), repeat=1)
+        if len(day_sales) <= xlsx_max_rows:
+            results['export.weekday_xlsx'], _ = measure(lambda: sales_export(day_sales, 'Excel'), repeat=1)
+        del inv_df, sales_df, day_sales
+        log('export.full_csv', results['export.full_csv'])
+
+        # --- الكتابة ---
+        sale_times = []
+        for name in names[:20]:
+            start = time.perf_counter()
+            store.record_sale(name, 0.5)
+            sale_times.append(time.perf_counter() - start)
+        results['write.record_sale'] = sum(sale_times) / len(sale_times)
+        batch = [rng.choice(names) for _ in range(500)]
+        results['write.deduct_batch_500'], _ = measure(lambda: store.deduct_batch(batch, [0.1] * len(batch)), repeat=1)
+        log('write.deduct_batch_500', results['write.deduct_batch_500'])
+
+    results['rss_mb'] = peak_rss_mb()
+    return results
+
+
+def bench_invoices(files, pages, workers, log):
+    """قراءة files فاتورة كل منها pages صفحة (بدون ذاكرة النتائج)
+
+    الأسماء من inventory.csv كما هي (الطويلة منها تتجاوز عمود الاسم)، ونصف الفواتير رؤوسها في
+    كل صفحة. recall: نسبة الأسطر الصحيحة التي استُخرجت كميتها (وليس عدد الأسطر فقط).
+    """
+    names = real_inventory_names()
+    invoices, truths = [], []
+    for i in range(files):
+        pdf_bytes, truth = make_invoice_pdf(names, pages, seed=i, header_on_every_page=i % 2 == 1)
+        invoices.append((f'invoice_{i}.pdf', pdf_bytes))
+        truths.append(Counter(quantity for _, quantity in truth))
+
+    results = {}
+    # التشغيل الأول يشمل تشغيل العمليات الفرعية
+    elapsed, output = measure(lambda: process_invoice_files(invoices, max_workers=workers), repeat=2)
+    results['extract.total'] = elapsed
+    results['extract.per_page'] = elapsed / (files * pages)
+    found = sum(sum((truth & Counter(product['quantity'] for product in result['products'])).values())
+                for truth, result in zip(truths, output))
+    results['extract.recall'] = found / sum(sum(truth.values()) for truth in truths)
+    log('extract.per_page', results['extract.per_page'])
+    return results
+
+
+def compare(previous_path, current):
+    """طباعة الفرق مع نتائج نسخة سابقة (التسريع = الزمن القديم / الزمن الجديد)"""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\nمقارنة مع {previous['revision']}:")
+    for section, values in current['results'].items():
+        old_values = previous['results'].get(section, {})
+        for metric, value in values.items():
+            old = old_values.get(metric)
+            if old is None or value is None:
+                continue
+            speedup = f"{old / value:7.2f}x" if metric not in NOT_TIMES and value else ''
+            print(f"  {section:<16} {metric:<26} {old:12.4f} -> {value:12.4f} {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياسات الأداء على بيانات صناعية")
+    parser.add_argument('--items', default='2000,20000,200000', help="أحجام المخزن (مفصولة بفواصل)")
+    parser.add_argument('--sales', default='10000,100000,1000000', help="عدد حركات المبيعات لكل حجم")
+    parser.add_argument('--pdf-files', type=int, default=4)
+    parser.add_argument('--pdf-pages', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None, help="عدد عمليات قراءة PDF")
+    parser.add_argument('--xlsx-max-rows', type=int, default=300_000, help="تخطي تصدير Excel للجداول الأكبر")
+    parser.add_argument('--quick', action='store_true', help="2000 صنف و 20000 حركة وفاتورتان فقط")
+    parser.add_argument('--output', help="ملف النتائج (افتراضياً benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="ملف نتائج سابق للمقارنة")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.items, args.sales, args.pdf_files, args.pdf_pages = '2000', '20000', 2, 4
+    sizes = list(zip((int(n) for n in args.items.split(',')), (int(n) for n in args.sales.split(','))))
+
+    def log(metric, seconds):
+        print(f"    {metric:<26} {seconds * 1000:10.2f} مللي ث", flush=True)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': {},
+    }
+    for items, sales_rows in sizes:
+        label = f'{items}x{sales_rows}'
+        print(f"المخزن {items:,} صنف | المبيعات {sales_rows:,} حركة")
+        report['results'][label] = bench_scenario(items, sales_rows, args.xlsx_max_rows, log)
+
+    print(f"فواتير PDF: {args.pdf_files} ملف × {args.pdf_pages} صفحة")
+    report['results']['invoices'] = bench_invoices(args.pdf_files, args.pdf_pages, args.workers, log)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"تم حفظ النتائج في {output}")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == '__main__':
+    main()
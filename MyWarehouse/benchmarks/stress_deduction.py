@@ -0,0 +1,96 @@
+"""اختبار ضغط للخصم المتزامن: عدة عمليات وخيوط تخصم من نفس الأصناف في نفس الوقت
+
+يتحقق في النهاية من عدم ضياع أي عملية خصم:
+    المتبقي = الافتتاحي - مجموع الحركات المسجلة، وعدد الحركات = عدد عمليات الخصم الناجحة.
+
+التشغيل من مجلد المشروع:
+    python benchmarks/stress_deduction.py [عدد_العمليات] [خيوط_لكل_عملية] [خصم_لكل_خيط]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from warehouse.store import ConcurrentUpdateError, WarehouseStore  # noqa: E402
+
+# عدد قليل من الأصناف حتى يكثر التعارض عليها
+HOT_ITEMS = ['Soft Grey 61x61', 'Plaza Bone Rec. 80x80', 'Bianco Colorado 60x60']
+OPENING = 500.0
+
+
+def worker(db_path, threads, per_thread, seed, results):
+    """عملية فرعية: عدة خيوط، لكل خيط اتصاله الخاص عبر نفس كائن المخزن"""
+    store = WarehouseStore(db_path, None, None)
+    counts = {'ok': 0, 'insufficient': 0, 'conflict': 0}
+    lock = threading.Lock()
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        for _ in range(per_thread):
+            item = rng.choice(HOT_ITEMS)
+            try:
+                outcome = 'ok' if store.record_sale(item, 1.0, 'stress') else 'insufficient'
+            except ConcurrentUpdateError:
+                outcome = 'conflict'
+            with lock:
+                counts[outcome] += 1
+
+    pool = [threading.Thread(target=run, args=(seed * 1000 + t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(counts)
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'warehouse.db')
+        store = WarehouseStore(db_path, None, None)
+        store.replace_inventory(pd.DataFrame({'الصنف': HOT_ITEMS, 'الافتتاحي': OPENING}))
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        start = time.perf_counter()
+        procs = [ctx.Process(target=worker, args=(db_path, threads, per_thread, p, results)) for p in range(processes)]
+        for proc in procs:
+            proc.start()
+        totals = {'ok': 0, 'insufficient': 0, 'conflict': 0}
+        for _ in procs:
+            for key, value in results.get().items():
+                totals[key] += value
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        inventory = store.inventory_frame().set_index('الصنف')
+        sales = store.sales_frame()
+        sold = sales.groupby('الصنف')['أمتار'].sum().reindex(HOT_ITEMS, fill_value=0.0)
+
+        attempts = processes * threads * per_thread
+        print(f"{processes} عمليات × {threads} خيوط × {per_thread} = {attempts} محاولة خصم في {elapsed:.2f} ث")
+        print(f"ناجحة: {totals['ok']} | كمية غير كافية: {totals['insufficient']} | تعارض بعد كل المحاولات: {totals['conflict']}")
+
+        assert sum(totals.values()) == attempts
+        assert len(sales) == totals['ok'], (len(sales), totals['ok'])
+        for item in HOT_ITEMS:
+            remaining = inventory.at[item, 'المتبقي']
+            assert remaining >= 0, (item, remaining)
+            assert abs(OPENING - sold[item] - remaining) < 1e-6, (item, remaining, sold[item])
+        print("✅ لم تضع أي عملية خصم")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""بيانات صناعية للقياس: مخزن بأسماء على نمط inventory.csv، سجل مبيعات كبير، وفواتير PDF متعددة الصفحات
+
+الكلمات والمقاسات تؤخذ من inventory.csv الحقيقي ثم تُركب بشكل عشوائي ثابت (seed) مثل
+"Soft Grey 61x61" أو "Plaza Bone Rec. 80x80"، فتبقى المطابقة والبحث قريبين من الاستخدام الفعلي.
+"""
+import os
+import random
+import re
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZE_PATTERN = re.compile(r'^\d+(?:\.\d+)?\s*[xX×*]\s*\d+(?:\.\d+)?$')
+FINISHES = ['Rec.', 'Matt', 'Pulido', 'Lappato', 'Polished', 'Soft', 'R', 'Rect.']
+
+
+def real_inventory_names():
+    """أسماء الأصناف كما هي في inventory.csv (بعضها أطول من عرض عمود الاسم في الفاتورة)"""
+    return pd.read_csv(os.path.join(ROOT, 'inventory.csv'))['الصنف'].astype(str).tolist()
+
+
+def _vocabulary():
+    """(كلمات الأسماء، المقاسات) من inventory.csv"""
+    words, sizes = set(), set()
+    for name in real_inventory_names():
+        for token in name.split():
+            if SIZE_PATTERN.match(token):
+                sizes.add(token)
+            elif token.isascii() and token.isalpha() and len(token) > 2:
+                words.add(token)
+    return sorted(words), sorted(sizes)
+
+
+def inventory_names(count, seed=0):
+    """count اسم صنف مختلف على نمط "السلسلة اللون [التشطيب] المقاس" """
+    words, sizes = _vocabulary()
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < count:
+        parts = rng.sample(words, rng.choice((1, 2, 2, 3)))
+        if rng.random() < 0.4:
+            parts.append(rng.choice(FINISHES))
+        parts.append(rng.choice(sizes))
+        name = ' '.join(parts)
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def make_inventory(count, seed=0):
+    """جدول مخزن بنفس أعمدة inventory.csv"""
+    rng = np.random.default_rng(seed)
+    opening = np.round(rng.uniform(50, 8000, count), 2)
+    return pd.DataFrame({'الصنف': inventory_names(count, seed), 'الافتتاحي': opening, 'المتبقي': opening})
+
+
+def make_sales(names, rows, seed=0, start='2023-01-01', days=730):
+    """سجل مبيعات بنفس أعمدة sales.csv موزع على days يوم (الأصناف الأولى أكثر مبيعاً)"""
+    rng = np.random.default_rng(seed)
+    # توزيع Zipf تقريبي: قلة من الأصناف تأخذ معظم الحركات كما في المبيعات الحقيقية
+    ranks = np.minimum(rng.zipf(1.3, rows), len(names)) - 1
+    offsets = np.sort(rng.integers(0, days * 24 * 3600 * 10**6, rows))
+    dates = pd.Timestamp(start) + pd.to_timedelta(offsets, unit='us')
+    notes = np.where(rng.random(rows) < 0.3, 'تم الإدخال عبر فاتورة PDF', '')
+    return pd.DataFrame({
+        'التاريخ': dates.strftime('%Y-%m-%d %H:%M:%S.%f'),
+        'الصنف': np.asarray(names, dtype=object)[ranks],
+        'أمتار': np.round(rng.uniform(0.5, 40, rows), 2),
+        'ملاحظة': notes,
+    })
+
+
+def noisy_name(name, rng):
+    """تشويه اسم الصنف كما يظهر في فواتير الموردين (أخطاء إملائية، حذف كلمات، تغيير الحالة)"""
+    text = str(name).strip()
+    choice = rng.random()
+    if choice < 0.25:
+        return text.upper()
+    if choice < 0.5 and len(text) > 4:
+        pos = rng.randrange(len(text))
+        return text[:pos] + text[pos + 1:]
+    if choice < 0.7:
+        words = text.split()
+        if len(words) > 2:
+            words.pop(rng.randrange(len(words)))
+        return ' '.join(words)
+    if choice < 0.85:
+        return text.replace('x', ' X ').replace('  ', ' ')
+    # اسم غير موجود في المخزن
+    return 'Unknown Item ' + str(rng.randrange(10_000))
+
+
+# --- فواتير PDF (كتابة مباشرة بدون مكتبات إضافية) ---
+ROWS_PER_PAGE = 35
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def pdf_text(x, y, text):
+    """أمر رسم نص بخط Helvetica حجم 10 يبدأ من النقطة (x، y) من أسفل الصفحة"""
+    return f"BT /F1 10 Tf {x} {y} Td ({_escape(text)}) Tj ET"
+
+
+def table_page(rows, header):
+    """محتوى صفحة فيها جدول (المنتج، الكمية) بخطوط حدود كاملة"""
+    ops = []
+    left, middle, right, row_height = 40, 400, 540, 18
+    top = y = 780
+    lines = ([('Product', 'Quantity')] if header else []) + rows
+    for product, quantity in lines:
+        ops.append(pdf_text(left + 4, y - 13, product))
+        ops.append(pdf_text(middle + 4, y - 13, str(quantity)))
+        y -= row_height
+    for k in range(len(lines) + 1):
+        ops.append(f"{left} {top - k * row_height} m {right} {top - k * row_height} l S")
+    for x in (left, middle, right):
+        ops.append(f"{x} {top} m {x} {y} l S")
+    # خط Helvetica الأساسي لا يدعم إلا latin-1
+    return '\n'.join(ops).encode('latin-1', 'replace')
+
+
+def pdf_document(streams):
+    """ملف PDF بصفحات A4 من محتوى كل صفحة (أوامر رسم كـ bytes)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = ' '.join(f"{4 + 2 * i} 0 R" for i in range(len(streams)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(streams)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, stream in enumerate(streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b''.join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def make_invoice_pdf(names, pages, seed=0, header_on_every_page=False):
+    """فاتورة PDF متعددة الصفحات: (المحتوى bytes، الأسطر الصحيحة [(الاسم الأصلي، الكمية)])
+
+    أسماء المنتجات مشوهة بـ noisy_name، والرؤوس في الصفحة الأولى فقط افتراضياً
+    (صفحات التكملة كما في فواتير الموردين الطويلة).
+    """
+    rng = random.Random(seed)
+    ascii_names = [name for name in names if name.isascii()] or list(names)
+    streams, truth = [], []
+    for page in range(pages):
+        rows = []
+        for _ in range(ROWS_PER_PAGE):
+            name = rng.choice(ascii_names)
+            quantity = round(rng.uniform(1, 50), 2)
+            rows.append((noisy_name(name, rng), quantity))
+            truth.append((name, quantity))
+        streams.append(table_page(rows, header=header_on_every_page or page == 0))
+    return pdf_document(streams), truth
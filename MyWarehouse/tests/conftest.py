@@ -0,0 +1,7 @@
+"""إعدادات pytest مشتركة لكل الاختبارات"""
+import os
+import sys
+
+# جذر المشروع (مثل benchmarks/run_all.py) حتى تُستورد warehouse و benchmarks من أي مجلد
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,67 @@
+"""اختبارات استيراد ملف Excel ودمجه مع المخزن"""
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+from warehouse.importer import import_inventory_workbook
+from warehouse.store import WarehouseStore
+
+
+def _workbook(rows, raw_numbers=None):
+    """ملف xlsx بالصفوف المعطاة؛ raw_numbers يستبدل قيماً رقمية كما كُتبت في XML الورقة
+    (openpyxl لا يكتب اللانهاية لكن برامج أخرى قد تكتبها ويقرؤها كـ float)"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['الصنف', 'الكمية'])
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    output = BytesIO()
+    with zipfile.ZipFile(buffer) as source, zipfile.ZipFile(output, 'w') as target:
+        for name in source.namelist():
+            data = source.read(name)
+            if name == 'xl/worksheets/sheet1.xml':
+                for placeholder, raw in (raw_numbers or {}).items():
+                    data = data.replace(f'<v>{placeholder}</v>'.encode(), f'<v>{raw}</v>'.encode())
+            target.writestr(name, data)
+    output.seek(0)
+    return output
+
+
+def test_merge_adds_new_items_and_shifts_remaining_of_existing_ones(tmp_path):
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), None, None)
+    store.replace_inventory(pd.DataFrame({'الصنف': ['بلاط أ', 'بلاط ب', 'بلاط ج'], 'الافتتاحي': [10.0, 10.0, 5.0]}))
+    assert store.record_sale('بلاط أ', 4.0)
+    assert store.record_sale('بلاط ب', 8.0)
+
+    report = import_inventory_workbook(store, _workbook([
+        ['بلاط أ', 15], ['بلاط ب', 5], ['بلاط ج', 5], ['بلاط د', 2], ['بلاط د', '1,000'],
+    ]))
+
+    assert {key: report[key] for key in ('valid', 'invalid', 'duplicates', 'added', 'updated', 'unchanged', 'clamped')} == {
+        'valid': 5, 'invalid': 0, 'duplicates': 1, 'added': 1, 'updated': 2, 'unchanged': 1, 'clamped': 1,
+    }
+    inventory = store.inventory_frame()
+    assert inventory.values.tolist() == [
+        ['بلاط أ', 15.0, 11.0],
+        # الكمية الجديدة أقل من المبيع فيصبح المتبقي صفراً
+        ['بلاط ب', 5.0, 0.0],
+        ['بلاط ج', 5.0, 5.0],
+        ['بلاط د', 1002.0, 1002.0],
+    ]
+
+
+def test_nan_and_infinite_quantities_are_reported_not_imported(tmp_path):
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), None, None)
+
+    report = import_inventory_workbook(store, _workbook(
+        [['بلاط أ', 111111], ['بلاط ب', 222222], ['بلاط ج', 'nan'], ['بلاط د', 'inf'], ['بلاط هـ', 3.5]],
+        raw_numbers={111111: '1E+999', 222222: '-1E+999'},
+    ))
+
+    assert (report['valid'], report['invalid']) == (1, 4)
+    assert [error['الصف'] for error in report['errors']] == [2, 3, 4, 5]
+    assert store.inventory_frame().values.tolist() == [['بلاط هـ', 3.5, 3.5]]
@@ -0,0 +1,26 @@
+"""اختبارات ربط قراءة الفواتير بالمخزن"""
+import pandas as pd
+
+from warehouse.ingest import InvoiceJob, invoice_job_key
+from warehouse.loader import DataLoader
+from warehouse.store import WarehouseStore
+
+
+def test_sales_do_not_rebuild_matcher_or_change_job_key(tmp_path):
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), None, None)
+    store.replace_inventory(pd.DataFrame({'الصنف': ['بلاط أ', 'بلاط ب'], 'الافتتاحي': [10.0, 10.0]}))
+    job = InvoiceJob(DataLoader(store, snapshot=False))
+    files = [('a.pdf', b'%PDF-1.4 a')]
+
+    matcher = job.matcher()
+    key = invoice_job_key(files, store.names_version())
+    assert store.record_sale('بلاط أ', 1.0)
+    store.deduct_batch(['بلاط ب'], [2.0])
+    assert job.matcher() is matcher
+    assert invoice_job_key(files, store.names_version()) == key
+
+    # صنف جديد يغير الأسماء فيُبنى الفهرس من جديد
+    store.merge_inventory([('بلاط ج', 5.0)])
+    assert job.matcher() is not matcher
+    assert 'بلاط ج' in job.matcher().names
+    assert invoice_job_key(files, store.names_version()) != key
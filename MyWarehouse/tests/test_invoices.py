@@ -0,0 +1,106 @@
+"""اختبارات قراءة فواتير PDF بموضع الجدول"""
+import os
+
+import pytest
+
+from benchmarks.synthetic import make_invoice_pdf, pdf_document, pdf_text, real_inventory_names, table_page
+from warehouse.invoices import _discard_pool, _plan_tasks, _run_tasks, process_invoice_files, products_from_pages
+
+
+def _products(pdf_bytes):
+    result = process_invoice_files([('invoice.pdf', pdf_bytes)], max_workers=1)[0]
+    assert result['error'] is None
+    return [(product['product'], product['quantity']) for product in result['products']]
+
+
+def test_unruled_continuation_page_keeps_wide_quantities_and_skips_header_and_footer():
+    first_page = [
+        pdf_text(40, 780, 'Product'), pdf_text(400, 780, 'Qty'),
+        pdf_text(40, 762, 'PORTLAND SNOW'), pdf_text(400, 762, '12.5'),
+        pdf_text(40, 744, 'RAL GREIGE'), pdf_text(400, 744, '3'),
+    ]
+    # صفحة التكملة: كميات أعرض من رأس العمود في الصفحة الأولى، ورأس صفحة وتذييل خارج الجدول
+    second_page = [
+        pdf_text(40, 810, 'Page 2 of 3'), pdf_text(400, 810, '17'),
+        pdf_text(40, 780, 'CARRARA WHITE'), pdf_text(400, 780, '1250.75'),
+        pdf_text(40, 762, 'BASALT GREY'), pdf_text(400, 762, '300'),
+        pdf_text(40, 40, 'Page 2 of 3'), pdf_text(400, 40, 'Total 12345'),
+        pdf_text(40, 25, 'Total'), pdf_text(400, 25, '1565.75'),
+    ]
+    pdf_bytes = pdf_document(['\n'.join(page).encode('latin-1') for page in (first_page, second_page)])
+
+    assert _products(pdf_bytes) == [
+        ('PORTLAND SNOW', 12.5), ('RAL GREIGE', 3.0), ('CARRARA WHITE', 1250.75), ('BASALT GREY', 300.0),
+    ]
+
+
+def test_ruled_invoice_reads_every_row_on_continuation_pages():
+    pdf_bytes, truth = make_invoice_pdf(['PORTLAND SNOW RC 100x100', 'RAL GREIGE MATT 10X20'], pages=3)
+    assert [quantity for _, quantity in _products(pdf_bytes)] == [quantity for _, quantity in truth]
+
+
+def test_ruled_invoice_skips_rows_without_quantity_and_stops_at_total():
+    first_page = table_page([
+        ('PORTLAND SNOW', '12.5'), ('DELIVERY CHARGE', '-'), ('RAL GREIGE', '3 M2'), ('SOFT GREY', '7'),
+    ], header=True)
+    second_page = table_page([('BASALT GREY', '1,250.75'), ('Total', '1273.25'), ('NOT A PRODUCT', '9')], header=False)
+
+    assert _products(pdf_document([first_page, second_page])) == [
+        ('PORTLAND SNOW', 12.5), ('RAL GREIGE', 3.0), ('SOFT GREY', 7.0), ('BASALT GREY', 1250.75),
+    ]
+
+
+def test_quantities_with_units_that_contain_digits():
+    rows = [('PORTLAND SNOW', '12.5 M2'), ('RAL GREIGE', '4 m\xb2'), ('SOFT GREY', '8M2')]
+    assert _products(pdf_document([table_page(rows, header=True)])) == [
+        ('PORTLAND SNOW', 12.5), ('RAL GREIGE', 4.0), ('SOFT GREY', 8.0),
+    ]
+
+
+@pytest.mark.parametrize('header_on_every_page', [False, True])
+def test_long_inventory_names_do_not_spill_into_the_quantity_column(header_on_every_page):
+    # بعض أسماء inventory.csv أعرض من عمود الاسم فتتداخل مع خانة الكمية
+    pdf_bytes, truth = make_invoice_pdf(real_inventory_names(), pages=5, seed=1,
+                                        header_on_every_page=header_on_every_page)
+    assert [quantity for _, quantity in _products(pdf_bytes)] == [quantity for _, quantity in truth]
+
+
+def test_pages_opened_for_layout_detection_are_not_extracted_again():
+    pdf_bytes, _ = make_invoice_pdf(['PORTLAND SNOW RC 100x100'], pages=3)
+    tasks, errors, inspected = _plan_tasks([(0, ('invoice.pdf', pdf_bytes))], max_workers=1)
+    assert not errors
+    assert [page['page'] for page in inspected[0]] == [0]
+    assert [(start, stop) for _, _, start, stop, _ in tasks] == [(1, 3)]
+
+
+def test_each_page_falls_back_on_its_own():
+    # الصفحة الأولى قُرئت بموضع الجدول، والباقي لم يُعرف فيه الجدول فيُقرأ بجداوله أو نصه
+    pages = [
+        {'rows': [['PORTLAND SNOW', '12.5']], 'tables': [], 'text': ''},
+        {'rows': [], 'tables': [[['Product', 'Qty'], ['RAL GREIGE', '3']]], 'text': 'Product Qty\nRAL GREIGE 3'},
+        {'rows': [], 'tables': [], 'text': 'المنتج الكمية\nSOFT GREY 7'},
+        {'rows': [], 'tables': [], 'text': 'BASALT GREY 2'},
+    ]
+    assert [(product['product'], product['quantity']) for product in products_from_pages(pages)] == [
+        ('PORTLAND SNOW', 12.5), ('RAL GREIGE', 3.0), ('SOFT GREY', 7.0), ('BASALT GREY', 2.0),
+    ]
+
+
+def _crash_once(marker, value):
+    # أول عملية تصل هنا تنتهي فجأة فتتعطل مجموعة العمليات كلها
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return value
+    os._exit(1)
+
+
+def test_broken_pool_is_rebuilt_and_unfinished_tasks_rerun(tmp_path):
+    marker = str(tmp_path / 'crashed')
+    tasks = [(marker, value) for value in range(4)]
+    try:
+        assert sorted(_run_tasks(_crash_once, tasks, max_workers=2)) == [0, 1, 2, 3]
+        # والمجموعة الجديدة تبقى صالحة للطلبات التالية
+        assert sorted(_run_tasks(_crash_once, tasks, max_workers=2)) == [0, 1, 2, 3]
+    finally:
+        _discard_pool()
@@ -0,0 +1,42 @@
+"""اختبارات قائمة المهام الخلفية"""
+import os
+import time
+
+from warehouse import jobs
+from warehouse.jobs import DONE, JobQueue
+
+
+def _wait(queue, job_id):
+    for _ in range(500):
+        job = queue.get(job_id)
+        if job['status'] not in jobs.ACTIVE:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"المهمة {job_id} لم تنتهِ")
+
+
+def test_submit_cleans_up_expired_jobs_and_their_files(tmp_path):
+    def export(job):
+        return {'file': job.write_output('export.csv', b'data')}
+
+    queue = JobQueue({'export': export, 'other': export}, path=str(tmp_path / 'jobs.db'),
+                     keep_seconds={'export': 3600})
+    try:
+        export_id = queue.submit('export', key='v1')
+        other_id = queue.submit('other', key='v1')
+        assert _wait(queue, export_id)['status'] == DONE
+        assert _wait(queue, other_id)['status'] == DONE
+        # انتهت المهمتان قبل ساعتين: مهمة التصدير تجاوزت مدتها والأخرى ما زالت ضمن KEEP_SECONDS
+        queue._update(export_id, finished=time.time() - 7200)
+        queue._update(other_id, finished=time.time() - 7200)
+
+        queue.submit('other', key='v2')
+        assert queue.get(export_id) is not None  # لم تمر CLEANUP_INTERVAL منذ آخر تنظيف
+
+        queue._last_cleanup -= jobs.CLEANUP_INTERVAL
+        queue.submit('other', key='v3')
+        assert queue.get(export_id) is None
+        assert not os.path.exists(queue.job_directory(export_id))
+        assert queue.read_output(other_id, 'export.csv') == b'data'
+    finally:
+        queue.shutdown()
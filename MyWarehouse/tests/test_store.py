@@ -0,0 +1,114 @@
+"""اختبارات مخزن SQLite: ترحيل ملفات CSV القديمة والخصم والدمج"""
+import threading
+
+import pandas as pd
+
+from warehouse.store import WarehouseStore, plan_batch_deduction
+
+
+def test_import_legacy_csv_with_mixed_date_formats(tmp_path):
+    inventory_csv = tmp_path / 'inventory.csv'
+    sales_csv = tmp_path / 'sales.csv'
+    pd.DataFrame({'الصنف': ['بلاط أ'], 'الافتتاحي': [100.0], 'المتبقي': [90.0]}).to_csv(
+        inventory_csv, index=False)
+    pd.DataFrame({
+        'التاريخ': ['2025-01-04 09:30:00', '05/01/2025', '2025-01-06', 'غير معروف', '13/01/2025 18:45'],
+        'الصنف': ['بلاط أ'] * 5,
+        'أمتار': [1.0, 2.0, 3.0, 4.0, 5.0],
+        'ملاحظة': [''] * 5,
+    }).to_csv(sales_csv, index=False)
+
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), str(inventory_csv), str(sales_csv))
+
+    sales = store.sales_frame()
+    # التواريخ غير ISO تُقرأ باليوم أولاً: 05/01/2025 هو 5 يناير (الأحد)
+    assert sales['التاريخ'].tolist() == [
+        '2025-01-04 09:30:00', '2025-01-05 00:00:00', '2025-01-06 00:00:00', '2025-01-13 18:45:00']
+    assert store.skipped_csv_sales() == 1
+    assert store.sales_by_day('2025-01-05') == (1, 2.0)
+    assert store.sales_by_weekday('Saturday') == (1, 1.0)
+    assert store.sales_by_weekday('Sunday') == (1, 2.0)
+    assert store.sales_by_weekday('Monday') == (2, 8.0)
+    assert store.sales_totals() == (4, 11.0)
+
+
+def test_inventory_ids_are_not_reused_after_reset(tmp_path):
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), None, None)
+    store.replace_inventory(pd.DataFrame({'الصنف': ['بلاط أ'], 'الافتتاحي': [10.0]}))
+    item_id, version = store._connection().execute("SELECT id, version FROM inventory").fetchone()
+
+    # خصم قُرئ قبل المسح لا يجب أن يطبق على الصنف الجديد الذي أُضيف بعده
+    store.reset()
+    store.replace_inventory(pd.DataFrame({'الصنف': ['بلاط ب'], 'الافتتاحي': [10.0]}))
+    assert not store._compare_and_deduct(item_id, version, 'بلاط أ', 4.0, '')
+    assert store.inventory_frame()['المتبقي'].tolist() == [10.0]
+
+
+def _store_with(tmp_path, stock):
+    store = WarehouseStore(str(tmp_path / 'warehouse.db'), None, None)
+    store.replace_inventory(pd.DataFrame({'الصنف': list(stock), 'الافتتاحي': list(stock.values())}))
+    return store
+
+
+def _remaining(store):
+    inventory = store.inventory_frame()
+    return dict(zip(inventory['الصنف'], inventory['المتبقي']))
+
+
+def test_plan_batch_deduction_accepts_repeated_lines_until_stock_runs_out():
+    plan = plan_batch_deduction(
+        ['بلاط أ', 'بلاط ب', 'بلاط أ', 'بلاط أ', 'غير موجود'], [4, 2, 5, 2, 1],
+        pd.Series({'بلاط أ': 10.0, 'بلاط ب': 1.0}))
+    assert plan['deductible'].tolist() == [True, False, True, False, False]
+    assert plan['available'].tolist() == [10.0, 1.0, 10.0, 10.0, 0.0]
+
+
+def test_deduct_batch_applies_only_the_lines_that_fit(tmp_path):
+    store = _store_with(tmp_path, {'بلاط أ': 10.0, 'بلاط ب': 1.0, 'بلاط ج': 5.0})
+
+    plan = store.deduct_batch(['بلاط أ', 'بلاط ب', 'بلاط أ', 'بلاط أ'], [4.0, 2.0, 5.0, 2.0], 'فاتورة')
+
+    assert plan['deductible'].tolist() == [True, False, True, False]
+    assert _remaining(store) == {'بلاط أ': 1.0, 'بلاط ب': 1.0, 'بلاط ج': 5.0}
+    # كل سطر مقبول حركة مستقلة، حتى المكرر لنفس الصنف
+    sales = store.sales_frame()
+    assert sorted(zip(sales['الصنف'], sales['أمتار'])) == [('بلاط أ', 4.0), ('بلاط أ', 5.0)]
+    assert store.sales_totals() == (2, 9.0)
+
+
+def test_deduct_batch_without_enough_stock_changes_nothing(tmp_path):
+    store = _store_with(tmp_path, {'بلاط أ': 3.0})
+    versions = store.versions()
+
+    plan = store.deduct_batch(['بلاط أ', 'غير موجود'], [4.0, 1.0])
+
+    assert not plan['deductible'].any()
+    assert _remaining(store) == {'بلاط أ': 3.0}
+    assert store.sales_totals()[0] == 0
+    assert store.versions() == versions
+
+
+def test_concurrent_deductions_are_never_lost(tmp_path):
+    store = _store_with(tmp_path, {'بلاط أ': 1000.0, 'بلاط ب': 1000.0})
+    errors = []
+
+    def sell(worker):
+        try:
+            for _ in range(20):
+                if worker % 2:
+                    assert store.record_sale('بلاط أ', 1.0)
+                else:
+                    assert store.deduct_batch(['بلاط أ', 'بلاط ب'], [1.0, 2.0])['deductible'].all()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sell, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # 6 خيوط × 20 مرة: كل خيط يخصم متراً من أ، والخيوط الزوجية تخصم مترين من ب أيضاً
+    assert _remaining(store) == {'بلاط أ': 880.0, 'بلاط ب': 880.0}
+    assert store.sales_totals() == (180, 240.0)
@@ -0,0 +1 @@
+"""الوحدات الأساسية لنظام إدارة مخازن النواقية (بدون واجهة Streamlit)"""
@@ -0,0 +1,7 @@
+"""تشغيل واجهة سطر الأوامر: python -m warehouse"""
+import sys
+
+from warehouse.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
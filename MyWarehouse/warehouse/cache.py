@@ -0,0 +1,99 @@
+"""ذاكرة تخزين دائمة على القرص لنتائج قراءة الفواتير ومطابقتها (مع حد أقصى للحجم وإزالة الأقدم استخداماً)"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from warehouse import metrics
+
+DEFAULT_CACHE_PATH = 'invoice_cache.db'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(data):
+    """بصمة محتوى الملف (لا تعتمد على اسم الملف)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts):
+    """مفتاح التخزين من عدة أجزاء (نوع النتيجة، بصمة الملف، رقم الإصدار...)"""
+    return ':'.join(str(part) for part in parts)
+
+
+class ResultCache:
+    """جدول SQLite بسيط: مفتاح -> قيمة JSON، مع وقت آخر استخدام لإزالة الأقدم عند تجاوز الحجم"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key, default=None):
+        """قراءة قيمة وتحديث وقت آخر استخدام لها"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                metrics.count('cache.misses')
+                return default
+            metrics.count('cache.hits')
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """حفظ قيمة ثم إزالة الأقدم استخداماً إذا تجاوز الحجم الحد المسموح"""
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, size, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """عدد العناصر والحجم الكلي بالبايت"""
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        """مسح جميع النتائج المخزنة"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries")
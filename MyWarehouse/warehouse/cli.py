@@ -0,0 +1,105 @@
+"""واجهة سطر الأوامر لقراءة مجلد كامل من فواتير PDF بدون Streamlit (لمهام cron والدفعات)
+
+أمثلة (من مجلد المشروع):
+    python -m warehouse ingest invoices/ --report report.csv
+    python -m warehouse ingest invoices/ --report report.json --apply
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from warehouse.cache import DEFAULT_CACHE_PATH, ResultCache
+from warehouse.ingest import DEFAULT_THRESHOLD, ingest_invoices, learn_from_deductions, record_match_stats
+from warehouse.matching import ProductMatcher
+from warehouse.store import DEFAULT_DB_PATH, WarehouseStore
+
+PDF_NOTE = 'تم الإدخال عبر فاتورة PDF'
+
+
+def _pdf_files(directory):
+    # فحص الامتداد بدون حساسية لحالة الأحرف في مرور واحد (glob على Windows و macOS لا يفرق
+    # بين *.pdf و *.PDF فتُقرأ الفاتورة مرتين)
+    files = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith('.pdf') and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                files.append((name, f.read()))
+    return files
+
+
+def write_report(lines, path):
+    """حفظ تقرير المطابقة بصيغة CSV أو JSON حسب امتداد الملف"""
+    if path.lower().endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(lines, f, ensure_ascii=False, indent=2)
+    else:
+        columns = ['file_name', 'original_name', 'matched_name', 'quantity', 'match_score', 'match_source',
+                   'deducted']
+        pd.DataFrame(lines, columns=columns).to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def cmd_ingest(args):
+    files = _pdf_files(args.directory)
+    if not files:
+        print(f"لا توجد ملفات PDF في {args.directory}", file=sys.stderr)
+        return 1
+
+    store = WarehouseStore(args.db)
+    matcher = ProductMatcher(store.inventory_frame()['الصنف'].astype(str), aliases=store.aliases())
+    cache = None if args.no_cache else ResultCache(args.cache)
+
+    def progress(done, total):
+        if not args.quiet:
+            print(f"\r{done}/{total}", end='', file=sys.stderr, flush=True)
+
+    lines, errors = ingest_invoices(files, matcher, cache=cache, max_workers=args.workers,
+                                    progress_callback=progress, threshold=args.threshold)
+    if not args.quiet:
+        print(file=sys.stderr)
+    for file_name, error in errors:
+        print(f"خطأ في قراءة ملف PDF ({file_name}): {error}", file=sys.stderr)
+    record_match_stats(store, lines)
+
+    for line in lines:
+        line['deducted'] = False
+    matched = [line for line in lines if line['matched_name']]
+    if args.apply and matched:
+        plan = store.deduct_batch([line['matched_name'] for line in matched],
+                                  [line['quantity'] for line in matched], PDF_NOTE)
+        for line, deducted in zip(matched, plan['deductible']):
+            line['deducted'] = bool(deducted)
+        learn_from_deductions(store, [line for line in matched if line['deducted']])
+
+    if args.report:
+        write_report(lines, args.report)
+
+    deducted = sum(line['deducted'] for line in lines)
+    print(f"الملفات: {len(files)} | المنتجات: {len(lines)} | المتطابقة: {len(matched)} | المخصومة: {deducted}")
+    return 2 if errors else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m warehouse', description="نظام إدارة مخازن النواقية - سطر الأوامر")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="مسار قاعدة البيانات (افتراضياً warehouse.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="قراءة ومطابقة جميع فواتير PDF في مجلد")
+    ingest.add_argument('directory', help="المجلد الذي يحتوي على ملفات PDF")
+    ingest.add_argument('--report', help="ملف تقرير المطابقة (.csv أو .json)")
+    ingest.add_argument('--apply', action='store_true', help="خصم المنتجات المتطابقة من المخزن")
+    ingest.add_argument('--workers', type=int, default=None, help="عدد العمليات المتوازية (افتراضياً عدد المعالجات)")
+    ingest.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="أقل نسبة تطابق مقبولة")
+    ingest.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="مسار ذاكرة نتائج الفواتير")
+    ingest.add_argument('--no-cache', action='store_true', help="تعطيل ذاكرة نتائج الفواتير")
+    ingest.add_argument('--quiet', action='store_true', help="عدم عرض التقدم")
+    ingest.set_defaults(func=cmd_ingest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
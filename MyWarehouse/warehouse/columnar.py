@@ -0,0 +1,102 @@
+"""لقطة عمودية لسجل المبيعات بصيغة Arrow IPC تُقرأ من القرص بالتعيين في الذاكرة (memory-map)
+
+سجل المبيعات لا يتغير إلا بالإضافة (أو بالمسح الكامل)، لذلك تُحفظ حركاته في ملف أعمدة ثنائي:
+الوقت timestamp، الصنف رقم من قاموس الأصناف (int32)، الأمتار float32، والملاحظة كقاموس.
+عند التحميل تُقرأ من SQLite الحركات الجديدة فقط وتُضاف إلى اللقطة، فلا يُعاد تحليل نصوص
+التواريخ والأرقام والأسماء للسجل كاملاً.
+
+pyarrow يأتي مع Streamlit؛ إذا لم يكن مثبتاً يُقرأ السجل من SQLite مباشرة (available() = False).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+# عدد الحركات الجديدة التي تُعاد عندها كتابة اللقطة (الأقل يُضاف في الذاكرة فقط)
+REWRITE_ROWS = 20_000
+
+
+def available():
+    return pa is not None
+
+
+def _to_arrow(rows):
+    """تحويل حركات sales_since إلى جدول Arrow بأنواع الأعمدة المضغوطة"""
+    return pa.table({
+        'id': pa.array(rows['id'].to_numpy(dtype='int64')),
+        'ts': pa.array(pd.to_datetime(rows['ts'], format='ISO8601').to_numpy(dtype='datetime64[ns]')),
+        'item_id': pa.array(rows['item_id'].to_numpy(dtype='int32')),
+        'meters': pa.array(rows['meters'].to_numpy(dtype='float32')),
+        'note': pa.array(rows['note'].astype(object).tolist(), type=pa.string()).dictionary_encode(),
+    })
+
+
+class SalesSnapshot:
+    """ملف Arrow بجانب قاعدة البيانات (warehouse.db.sales.arrow) يُحدّث بالحركات الجديدة"""
+
+    def __init__(self, store, path=None):
+        self.store = store
+        self.path = path or f'{store.path}.sales.arrow'
+
+    def _read(self):
+        """(الجدول، رقم الجيل، آخر رقم حركة) من الملف، أو None إذا لم يوجد أو كان تالفاً"""
+        try:
+            table = pa.ipc.open_file(pa.memory_map(self.path, 'r')).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        meta = table.schema.metadata or {}
+        return table, int(meta.get(b'generation', -1)), int(meta.get(b'last_id', 0))
+
+    def _write(self, table, generation, last_id):
+        """كتابة اللقطة في ملف مؤقت ثم استبدال الملف القديم دفعة واحدة"""
+        table = table.unify_dictionaries().combine_chunks().replace_schema_metadata(
+            {'generation': str(generation), 'last_id': str(last_id)})
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # على Windows لا يمكن استبدال ملف معين في ذاكرة عملية أخرى: نكتفي بالنسخة في الذاكرة
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def table(self):
+        """جدول Arrow محدث بكل حركات السجل"""
+        snapshot = self._read()
+        after_id = snapshot[2] if snapshot else 0
+        generation, rows = self.store.sales_since(after_id)
+        if snapshot is not None and snapshot[1] != generation:
+            # مُسح السجل بعد كتابة اللقطة: نبدأ من جديد
+            snapshot, after_id = None, 0
+            generation, rows = self.store.sales_since(0)
+
+        delta = _to_arrow(rows)
+        table = delta if snapshot is None else pa.concat_tables([snapshot[0], delta])
+        if snapshot is None or len(delta) >= REWRITE_ROWS:
+            last_id = int(rows['id'].iloc[-1]) if len(rows) else after_id
+            if self._write(table, generation, last_id):
+                table = self._read()[0]
+        return table
+
+
+def sales_frame(table, item_ids, categories):
+    """جدول اللقطة كـ DataFrame بأعمدة sales.csv (نفس أنواع type_sales)
+
+    item_ids: أرقام قاموس الأصناف مرتبة، categories: أسماؤها بنفس الترتيب (pd.Index يمكن مشاركته
+    مع جدول المخزن). أعمدة الأرقام تُقرأ من الملف المعين في الذاكرة بدون نسخ.
+    """
+    codes = np.searchsorted(item_ids, table.column('item_id').to_numpy()).astype('int32')
+    return pd.DataFrame({
+        'التاريخ': table.column('ts').to_numpy(),
+        'الصنف': pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories)),
+        'أمتار': table.column('meters').to_numpy(),
+        'ملاحظة': table.column('note').to_pandas().astype('category'),
+    }, copy=False)
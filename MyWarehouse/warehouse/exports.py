@@ -0,0 +1,125 @@
+"""إنشاء ملفات التصدير (Excel / CSV) للجرد والمبيعات
+
+ملفات Excel تُكتب صفاً صفاً في وضع الكتابة فقط: xlsxwriter (constant_memory) إذا كانت
+مثبتة، وإلا openpyxl بوضع write_only، فلا يُبنى المصنف كاملاً في الذاكرة.
+"""
+import zipfile
+from io import BytesIO
+
+from warehouse import metrics
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+ZIP_MIME = "application/zip"
+
+# صيغ التصدير المتاحة (CSV أسرع بكثير مع سجلات المبيعات الكبيرة)
+EXPORT_FORMATS = ['Excel', 'CSV']
+
+
+def _rows(df):
+    """صفوف الجدول كقيم Python عادية (بدون أنواع numpy أو الفئات)"""
+    columns = [df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns]
+    return zip(*columns)
+
+
+def _write_xlsxwriter(sheets, output):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True,
+                                            'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    for sheet_name, df in sheets:
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(column) for column in df.columns])
+        for row_number, row in enumerate(_rows(df), start=1):
+            worksheet.write_row(row_number, 0, row)
+    workbook.close()
+
+
+def _write_openpyxl(sheets, output):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append([str(column) for column in df.columns])
+        for row in _rows(df):
+            worksheet.append(row)
+    workbook.save(output)
+
+
+def sheets_to_xlsx(sheets):
+    """كتابة قائمة (اسم الورقة، الجدول) إلى ملف Excel وإرجاع محتواه كـ bytes"""
+    output = BytesIO()
+    try:
+        _write_xlsxwriter(sheets, output)
+    except ImportError:
+        _write_openpyxl(sheets, output)
+    return output.getvalue()
+
+
+def frame_to_csv(df):
+    """تصدير جدول إلى CSV (UTF-8 مع BOM حتى يفتحه Excel بالعربية بشكل صحيح)"""
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+def sheets_to_csv_zip(sheets):
+    """عدة جداول كملفات CSV داخل ملف ZIP واحد"""
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, df in sheets:
+            archive.writestr(f"{sheet_name}.csv", frame_to_csv(df))
+    return output.getvalue()
+
+
+@metrics.timed('export.full_inventory')
+def full_inventory_export(inv_df, sales_df, file_format='Excel'):
+    """ملف الجرد الكامل (الجرد + المبيعات إن وجدت): (المحتوى، الامتداد، نوع MIME)"""
+    sheets = [('الجرد', inv_df)]
+    # إضافة ورقة بالمبيعات إذا كانت موجودة
+    if not sales_df.empty:
+        sheets.append(('المبيعات', sales_df))
+    if file_format == 'CSV':
+        if len(sheets) == 1:
+            return frame_to_csv(inv_df), 'csv', CSV_MIME
+        return sheets_to_csv_zip(sheets), 'zip', ZIP_MIME
+    return sheets_to_xlsx(sheets), 'xlsx', XLSX_MIME
+
+
+@metrics.timed('export.sales')
+def sales_export(sales_df, file_format='Excel'):
+    """ملف مبيعات واحد: (المحتوى، الامتداد، نوع MIME)"""
+    if file_format == 'CSV':
+        return frame_to_csv(sales_df), 'csv', CSV_MIME
+    return sheets_to_xlsx([('Sheet1', sales_df)]), 'xlsx', XLSX_MIME
+
+
+# ملف التصدير مرتبط بنسخة البيانات ويُبنى من جديد بعد أي تعديل، فلا يُحتفظ به طويلاً
+EXPORT_KEEP_SECONDS = 24 * 3600
+
+
+class ExportJob:
+    """تنفيذ مهمة 'export' في warehouse.jobs: الملف يُكتب كمخرج للمهمة
+
+    params: {'what': 'full' أو 'weekday', 'weekday': اسم اليوم بالإنجليزية, 'format': 'Excel' أو 'CSV'}؛
+    النتيجة {'file': اسم ملف المخرج، 'ext'، 'mime'}.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __call__(self, job):
+        from warehouse.loader import type_sales
+
+        params = job.params
+        job.progress(0, 1, "جاري قراءة البيانات...")
+        if params['what'] == 'full':
+            inv_df, sales_df = self.loader.frames()
+            job.progress(0, 1, "جاري كتابة الملف...")
+            data, ext, mime = full_inventory_export(inv_df, sales_df, params['format'])
+        else:
+            # قراءة حركات هذا اليوم فقط عبر فهرس يوم الأسبوع
+            day_sales = type_sales(self.loader.store.sales_frame(weekday=params['weekday']))
+            job.progress(0, 1, "جاري كتابة الملف...")
+            data, ext, mime = sales_export(day_sales[['التاريخ', 'الصنف', 'أمتار']], params['format'])
+        job.progress(1, 1)
+        return {'file': job.write_output(f'export.{ext}', data), 'ext': ext, 'mime': mime}
@@ -0,0 +1,86 @@
+"""استيراد ملف Excel للمخزن الرئيسي صفاً صفاً ودمجه مع الأصناف الحالية
+
+الملف يُقرأ بوضع openpyxl للقراءة فقط (read_only) فلا يُحمّل المصنف كاملاً في الذاكرة، وكل صف
+يُتحقق منه أثناء القراءة: العمود الأول اسم الصنف والثاني الكمية الافتتاحية، والصف الأول عناوين.
+الصفوف الصحيحة تُدمج عبر WarehouseStore.merge_inventory في معاملة واحدة (إما كلها أو لا شيء).
+"""
+import math
+
+from warehouse import metrics
+
+# أقصى عدد أخطاء تُحفظ تفاصيلها في التقرير (الباقي يُعد فقط)
+MAX_ERRORS = 200
+# كل كم صف يُستدعى progress_callback
+PROGRESS_EVERY = 1000
+
+
+def _quantity(value):
+    """الكمية كرقم أو None إذا لم تكن رقماً صالحاً (NaN واللانهاية ليست كميات)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        quantity = float(value)
+    elif isinstance(value, str):
+        try:
+            quantity = float(value.strip().replace(',', ''))
+        except ValueError:
+            return None
+    else:
+        return None
+    return quantity if math.isfinite(quantity) else None
+
+
+def iter_workbook_rows(source, report, progress_callback=None):
+    """صفوف (الاسم، الكمية) الصحيحة من أول ورقة في المصنف، مع تسجيل الأخطاء في report"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # max_row من أبعاد الورقة المحفوظة في الملف وقد لا تكون موجودة
+        total = max((sheet.max_row or 0) - 1, 0) or None
+        for row_number, row in enumerate(sheet.iter_rows(min_row=2, max_col=2, values_only=True), start=2):
+            report['rows'] += 1
+            if progress_callback is not None and report['rows'] % PROGRESS_EVERY == 0:
+                progress_callback(report['rows'], total)
+            name, value = (tuple(row) + (None, None))[:2]
+            name = str(name).strip() if name is not None else ''
+            if not name and (value is None or str(value).strip() == ''):
+                report['empty'] += 1
+                continue
+
+            error = None
+            quantity = _quantity(value)
+            if not name:
+                error = "اسم الصنف فارغ"
+            elif quantity is None:
+                error = f"الكمية غير صالحة: {value!r}"
+            elif quantity < 0:
+                error = f"الكمية سالبة: {quantity:g}"
+            if error:
+                report['invalid'] += 1
+                if len(report['errors']) < MAX_ERRORS:
+                    report['errors'].append({'الصف': row_number, 'الصنف': name, 'الخطأ': error})
+                continue
+
+            report['valid'] += 1
+            yield name, quantity
+        if progress_callback is not None:
+            progress_callback(report['rows'], report['rows'])
+    finally:
+        workbook.close()
+
+
+@metrics.timed('import.workbook')
+def import_inventory_workbook(store, source, progress_callback=None):
+    """دمج ملف Excel (مسار أو ملف مفتوح) مع المخزن وإرجاع تقرير بالنتيجة
+
+    الأصناف الجديدة تُضاف، والموجودة تتغير كميتها الافتتاحية ويتغير المتبقي بنفس الفرق،
+    والأصناف غير الموجودة في الملف تبقى كما هي. الصفوف غير الصالحة تُتخطى وتظهر في
+    report['errors'] برقم الصف. progress_callback(عدد_الصفوف_المقروءة، العدد_الكلي_أو_None).
+    """
+    report = {'rows': 0, 'valid': 0, 'invalid': 0, 'empty': 0, 'errors': []}
+    merged = store.merge_inventory(iter_workbook_rows(source, report, progress_callback))
+    report['duplicates'] = report['valid'] - merged['rows']
+    report.update({key: merged[key] for key in ('added', 'updated', 'unchanged', 'clamped')})
+    return report
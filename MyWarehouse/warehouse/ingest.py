@@ -0,0 +1,115 @@
+"""قراءة فواتير PDF ومطابقة منتجاتها مع المخزن (مشتركة بين واجهة Streamlit وسطر الأوامر)"""
+import threading
+from collections import Counter
+
+from warehouse.cache import content_hash, make_key
+from warehouse.invoices import EXTRACTOR_VERSION, process_invoice_files
+from warehouse.matching import ALIAS, FUZZY, ProductMatcher
+
+DEFAULT_THRESHOLD = 0.6
+
+
+def match_products(result, matcher, cache=None, threshold=DEFAULT_THRESHOLD):
+    """مطابقة منتجات ملف واحد (أو استرجاعها إذا سبقت مطابقة نفس الملف مع نفس نسخة المخزن)"""
+    products = result['products']
+    matches = None
+    if cache is not None:
+        matches_key = make_key('resolved', result['content_hash'], EXTRACTOR_VERSION, matcher.version, threshold)
+        matches = cache.get(matches_key)
+    if matches is None or len(matches) != len(products):
+        matches = [matcher.resolve(prod['product'], threshold) for prod in products]
+        if cache is not None and not result['error']:
+            cache.set(matches_key, matches)
+
+    return [
+        {
+            'original_name': prod['product'],
+            'matched_name': matched_product,
+            'quantity': prod['quantity'],
+            'match_score': score,
+            'match_source': source,
+            'file_name': result['file_name'],
+        }
+        for prod, (matched_product, score, source) in zip(products, matches)
+    ]
+
+
+def ingest_invoices(files, matcher, cache=None, max_workers=None, progress_callback=None,
+                    threshold=DEFAULT_THRESHOLD):
+    """استخراج ومطابقة منتجات عدة ملفات (اسم الملف، المحتوى)
+
+    يُرجع (أسطر المنتجات بترتيب الملفات، قائمة (اسم الملف، رسالة الخطأ)).
+    """
+    results = process_invoice_files(files, max_workers=max_workers,
+                                    progress_callback=progress_callback, cache=cache)
+    lines, errors = [], []
+    for result in results:
+        if result['error']:
+            errors.append((result['file_name'], result['error']))
+        lines.extend(match_products(result, matcher, cache, threshold))
+    return lines, errors
+
+
+def invoice_job_key(files, names_version, aliases_version=0, threshold=DEFAULT_THRESHOLD):
+    """مفتاح مهمة الفواتير: نفس الملفات مع نفس أسماء الأصناف والأسماء المتعلمة تعطي نفس النتيجة
+
+    names_version من WarehouseStore.names_version (عمليات الخصم لا تغيره فلا تُعاد المهمة بعد كل بيع).
+    """
+    hashes = ','.join(content_hash(pdf_bytes) for _, pdf_bytes in files)
+    return make_key(content_hash(hashes.encode()), EXTRACTOR_VERSION, 'names', names_version, aliases_version,
+                    threshold)
+
+
+def record_match_stats(store, lines):
+    """إضافة طرق مطابقة الأسطر إلى إحصاءات الأسماء المتعلمة في قاعدة البيانات"""
+    store.record_matches(Counter(line['match_source'] for line in lines),
+                         [line['original_name'] for line in lines if line['match_source'] == ALIAS])
+
+
+def learn_from_deductions(store, lines):
+    """حفظ المطابقات التقريبية للأسطر التي تأكد خصمها كأسماء متعلمة (تُطابق مباشرة في الفواتير التالية)"""
+    return store.learn_aliases(
+        [(line['original_name'], line['matched_name']) for line in lines
+         if line['matched_name'] and line.get('match_source') == FUZZY],
+        source='deduction')
+
+
+class InvoiceJob:
+    """تنفيذ مهمة 'invoices' في warehouse.jobs: الملفات محفوظة كمدخلات 0.pdf, 1.pdf, ...
+
+    params: {'files': [أسماء الملفات], 'threshold'}؛ النتيجة {'lines': [...], 'errors': [[الملف، الخطأ]]}.
+    فهرس المطابقة يُبنى مرة واحدة لكل نسخة من أسماء الأصناف (والأسماء المتعلمة تُضاف إليه بدون إعادة بنائه)، ومهام الفواتير تُنفذ واحدة بعد الأخرى
+    لأن كل منها يستخدم كل المعالجات في مجموعة العمليات المشتركة.
+    """
+
+    def __init__(self, loader, cache=None, max_workers=None):
+        self.loader = loader
+        self.cache = cache
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._matcher = None
+        self._aliased = None
+
+    def matcher(self):
+        store = self.loader.store
+        # الخصم لا يغير أسماء الأصناف، فلا يُعاد بناء الفهرس بعد كل عملية بيع
+        names_version = store.names_version()
+        aliases_version = store.aliases_version()
+        with self._lock:
+            if self._matcher is None or self._matcher[0] != names_version:
+                names = self.loader.inventory()['الصنف'].astype(str)
+                self._matcher = (names_version, ProductMatcher(names))
+                self._aliased = None
+            if self._aliased is None or self._aliased[0] != aliases_version:
+                self._aliased = (aliases_version, self._matcher[1].with_aliases(store.aliases()))
+            return self._aliased[1]
+
+    def __call__(self, job):
+        files = [(name, job.read_input(f'{i}.pdf')) for i, name in enumerate(job.params['files'])]
+        with self._run_lock:
+            lines, errors = ingest_invoices(
+                files, self.matcher(), cache=self.cache, max_workers=self.max_workers,
+                progress_callback=job.progress, threshold=job.params.get('threshold', DEFAULT_THRESHOLD))
+        record_match_stats(self.loader.store, lines)
+        return {'lines': lines, 'errors': errors}
@@ -0,0 +1,583 @@
+"""استخراج المنتجات والكميات من فواتير PDF باستخدام مجموعة عمليات متوازية
+
+موضع جدول المنتجات (صف الرؤوس وحدود الأعمدة) يُحدد مرة واحدة لكل ملف من أول صفحة فيها
+الرؤوس، ثم تُقرأ كل صفحة (بما فيها صفحات التكملة بدون رؤوس) من منطقة الجدول فقط بنفس حدود
+الأعمدة. الملفات التي لا يُعرف فيها موضع الجدول تُقرأ بالطريقة العامة (كل الجداول ثم النص).
+"""
+import multiprocessing
+import os
+import re
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pdfplumber
+
+from warehouse import metrics
+from warehouse.cache import content_hash, make_key
+
+# يجب زيادة هذا الرقم عند أي تغيير في طريقة الاستخراج حتى لا تُستخدم نتائج قديمة من الذاكرة
+EXTRACTOR_VERSION = 5
+
+# أقصى عدد صفحات تعالجها العملية الواحدة من الملف (الملفات الكبيرة تُقسم على عدة عمليات)
+PAGES_PER_TASK = 8
+
+# عدد الصفحات الأولى التي يُبحث فيها عن رؤوس جدول المنتجات
+LAYOUT_SEARCH_PAGES = 3
+# طرق البحث عن حدود الجدول في pdfplumber: الخطوط المرسومة أولاً ثم محاذاة النص
+TABLE_STRATEGIES = ('lines', 'text')
+# المسافات (بالنقاط) التي تُعتبر داخل نفس السطر / فاصلاً بين كلمتين (نفس قيم pdfplumber الافتراضية)
+Y_TOLERANCE = 3
+X_TOLERANCE = 3
+# في الجدول غير المرسوم: مسافة بين سطرين أكبر من هذا العدد من ارتفاع الصف تفصل الجدول عما حوله
+# (رأس الصفحة وتذييلها)
+MAX_ROW_GAP = 1.5
+# خانة كمية صالحة: رقم (مع فواصل الآلاف) وبعده وحدة قصيرة اختيارية قد تنتهي برقم (M2، م2)
+QUANTITY_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)(?:\s*[^\d\s]{1,3}\d?)?')
+# أسطر المجاميع التي ينتهي عندها جدول المنتجات (تُقارن بخانة الاسم كاملة بعد توحيدها)
+TOTAL_KEYWORDS = {'total', 'sub total', 'subtotal', 'grand total', 'المجموع', 'الإجمالي', 'الاجمالي',
+                  'إجمالي', 'اجمالي', 'المجموع الكلي'}
+
+_pool = None
+_pool_workers = 0
+
+
+def find_product_column_index(headers):
+    """العثور على فهرس عمود المنتج"""
+    keywords = ['المنتج', 'الصنف', 'الاسم', 'product', 'item', 'name']
+    for i, header in enumerate(headers):
+        if header:
+            header_text = str(header).strip().lower()
+            for keyword in keywords:
+                if keyword in header_text:
+                    return i
+    return None
+
+
+def find_quantity_column_index(headers):
+    """العثور على فهرس عمود الكمية"""
+    keywords = ['الكمية', 'quantity', 'qty', 'عدد', 'amount']
+    for i, header in enumerate(headers):
+        if header:
+            header_text = str(header).strip().lower()
+            for keyword in keywords:
+                if keyword in header_text:
+                    return i
+    return None
+
+
+def extract_products_from_text(text):
+    """استخراج المنتجات من النص باستخدام regex"""
+    products = []
+    lines = text.split('\n')
+
+    product_pattern = r'(.+?)\s+(\d+\.?\d*)'
+    in_table = False
+
+    for i, line in enumerate(lines):
+        line_lower = line.strip().lower()
+        # البحث عن بداية الجدول
+        if 'المنتج' in line_lower and 'الكمية' in line_lower:
+            in_table = True
+            continue
+
+        if in_table and line.strip():
+            # محاولة استخراج المنتج والكمية
+            match = re.search(product_pattern, line)
+            if match:
+                product_name = match.group(1).strip()
+                quantity = match.group(2).strip()
+                try:
+                    qty = float(quantity)
+                    if qty > 0:
+                        products.append({'product': product_name, 'quantity': qty})
+                except:
+                    pass
+
+    return products
+
+
+def _product_from_cells(product_cell, quantity_cell):
+    """منتج واحد من خانتي الاسم والكمية، أو None إذا لم يكن سطر منتج"""
+    product_name = str(product_cell).strip() if product_cell else ""
+    quantity_str = str(quantity_cell).strip() if quantity_cell else "0"
+
+    if product_name and product_name.lower() not in ['المنتج', 'الصنف', 'الاسم', '']:
+        try:
+            qty = float(re.sub(r'[^\d.]', '', quantity_str))
+            if qty > 0:
+                return {'product': product_name, 'quantity': qty}
+        except:
+            pass
+    return None
+
+
+def extract_products_from_tables(tables):
+    """استخراج المنتجات من الجداول"""
+    products = []
+
+    for table in tables:
+        if not table or len(table) < 2:
+            continue
+
+        # البحث عن صف الرؤوس
+        headers = table[0] if table else []
+        product_col = find_product_column_index(headers)
+        quantity_col = find_quantity_column_index(headers)
+
+        if product_col is not None and quantity_col is not None:
+            # استخراج البيانات من الصفوف
+            for row in table[1:]:
+                if len(row) > max(product_col, quantity_col):
+                    product = _product_from_cells(row[product_col], row[quantity_col])
+                    if product:
+                        products.append(product)
+
+    return products
+
+
+def extract_products_from_rows(rows):
+    """استخراج المنتجات من صفوف (الاسم، الكمية) المقروءة بموضع الجدول"""
+    products = []
+    for product_cell, quantity_cell in rows:
+        product = _product_from_cells(product_cell, quantity_cell)
+        if product:
+            products.append(product)
+    return products
+
+
+def detect_layout(pdf):
+    """موضع جدول المنتجات من أول صفحة فيها رؤوس الأعمدة (المنتج والكمية)
+
+    يُرجع {'page', 'top', 'columns', 'product_col', 'quantity_col', 'strategy', 'row_height'} أو None:
+    columns حدود الأعمدة الأفقية بالترتيب، و top أعلى صف الرؤوس في صفحته، و row_height المسافة
+    المعتادة بين صفوف الجدول (None إذا كان صفاً واحداً).
+    """
+    for page in pdf.pages[:LAYOUT_SEARCH_PAGES]:
+        for strategy in TABLE_STRATEGIES:
+            settings = {'vertical_strategy': strategy, 'horizontal_strategy': strategy}
+            for table in page.find_tables(settings):
+                extracted = table.extract()
+                for row, cells in zip(extracted, table.rows):
+                    product_col = find_product_column_index(row)
+                    quantity_col = find_quantity_column_index(row)
+                    if product_col is None or quantity_col is None or product_col == quantity_col:
+                        continue
+                    boxes = cells.cells
+                    if boxes[product_col] is None or boxes[quantity_col] is None:
+                        continue
+                    columns = sorted({box[0] for box in boxes if box} | {box[2] for box in boxes if box})
+                    tops = sorted(table_row.bbox[1] for values, table_row in zip(extracted, table.rows) if any(values))
+                    gaps = sorted(b - a for a, b in zip(tops, tops[1:]) if b - a > Y_TOLERANCE)
+                    return {
+                        'page': page.page_number - 1,
+                        'top': min(box[1] for box in boxes if box),
+                        'columns': columns,
+                        # رقم العمود حسب الحدود (الخانات المدمجة في صف الرؤوس لا تغير الترتيب)
+                        'product_col': columns.index(boxes[product_col][0]),
+                        'quantity_col': columns.index(boxes[quantity_col][0]),
+                        'strategy': strategy,
+                        'row_height': gaps[(len(gaps) - 1) // 2] if gaps else None,
+                    }
+    return None
+
+
+def _cell_text(chars):
+    """نص خانة من أحرفها: الأسطر بالترتيب من الأعلى، ومسافة بين الأحرف المتباعدة"""
+    lines = []
+    for char in sorted(chars, key=lambda c: (c['top'], c['x0'])):
+        if lines and char['top'] - lines[-1][0] <= Y_TOLERANCE:
+            lines[-1][1].append(char)
+        else:
+            lines.append((char['top'], [char]))
+    texts = []
+    for _, line in lines:
+        line.sort(key=lambda c: c['x0'])
+        parts = [line[0]['text']]
+        for previous, char in zip(line, line[1:]):
+            if char['x0'] - previous['x1'] > X_TOLERANCE and previous['text'] != ' ' and char['text'] != ' ':
+                parts.append(' ')
+            parts.append(char['text'])
+        texts.append(''.join(parts).strip())
+    return '\n'.join(texts)
+
+
+def _row_separators(page, left, right, top):
+    """مواضع الخطوط الأفقية المرسومة التي تعبر منطقة الجدول (حدود الصفوف)"""
+    positions = sorted(edge['top'] for edge in page.horizontal_edges
+                       if edge['x0'] < right and edge['x1'] > left and edge['top'] >= top - Y_TOLERANCE)
+    separators = []
+    for position in positions:
+        if not separators or position - separators[-1] > 1:
+            separators.append(position)
+    return separators
+
+
+def _quantity_text(text):
+    """الرقم من خانة الكمية (بدون فواصل الآلاف والوحدة) أو None إذا لم تكن كمية"""
+    match = QUANTITY_PATTERN.fullmatch(text.strip()) if text else None
+    return match.group(1).replace(',', '') if match else None
+
+
+def _is_total(product):
+    return bool(product) and product.strip().strip(':').strip().lower() in TOTAL_KEYWORDS
+
+
+def _table_rows(rows, max_gap=None):
+    """صفوف المنتجات فقط من صفوف المنطقة [(أعلى الصف، الاسم، الكمية)] المرتبة من الأعلى
+
+    نهاية الجدول من شكل الصفحة وليس من خانة واحدة: مع max_gap (جدول غير مرسوم) تُقسم الصفوف
+    عند كل مسافة أكبر منه ويُختار الجزء الذي فيه أكثر الكميات الصالحة (رأس الصفحة وتذييلها
+    خارجه)، والجدول المرسوم محدود بخطوطه أصلاً. داخل الجزء يبدأ الجدول من أول صف كميته رقم
+    (ما قبله رؤوس) وينتهي عند سطر المجموع؛ الصفوف التي كميتها ليست رقماً (رسوم التوصيل "-"
+    أو رؤوس مكررة مثلاً) تُتخطى فقط.
+    """
+    blocks = [[]]
+    for row in rows:
+        if max_gap is not None and blocks[-1] and row[0] - blocks[-1][-1][0] > max_gap:
+            blocks.append([])
+        blocks[-1].append(row)
+    block = max(blocks, key=lambda block: sum(_quantity_text(quantity) is not None for _, _, quantity in block))
+
+    table = []
+    started = False
+    for _, product, quantity in block:
+        if _is_total(product):
+            if started:
+                break
+            continue
+        number = _quantity_text(quantity)
+        if number is None:
+            continue
+        started = True
+        table.append([product, number])
+    return table
+
+
+def _text_runs(chars):
+    """تقسيم الأحرف (بترتيب رسمها في الصفحة) إلى مقاطع متصلة على نفس السطر
+
+    كل نص في خانة يُرسم عادة كمقطع واحد، فيُنسب المقطع كاملاً إلى العمود الذي يبدأ فيه: اسم
+    أطول من عموده لا تدخل بقيته في خانة الكمية المجاورة.
+    """
+    runs = []
+    for char in chars:
+        if runs:
+            previous = runs[-1][-1]
+            if (abs(char['top'] - previous['top']) <= Y_TOLERANCE
+                    and previous['x1'] - 1 <= char['x0'] <= previous['x1'] + X_TOLERANCE):
+                runs[-1].append(char)
+                continue
+        runs.append([char])
+    return runs
+
+
+def _layout_rows(page, layout):
+    """صفوف (الاسم، الكمية) من منطقة الجدول في الصفحة بحدود الأعمدة المحددة مسبقاً
+
+    نصوص الصفحة تحت الرؤوس توزع مباشرة على الخانات: الأعمدة من حدود صف الرؤوس، والصفوف من
+    الخطوط الأفقية المرسومة (أو من أسطر النص إذا لم يكن الجدول مرسوماً)، بدون البحث عن الجدول
+    في كل صفحة من جديد. العمودان الأول والأخير مفتوحان حتى حافة الصفحة (قيمة أعرض من رأس
+    عمودها لا تُقطع)، ونهاية الجدول تُحدد بـ _table_rows.
+    """
+    number = page.page_number - 1
+    if number < layout['page']:
+        return []
+    columns = layout['columns']
+    top = layout['top'] - Y_TOLERANCE if number == layout['page'] else page.bbox[1]
+    runs = _text_runs([char for char in page.chars if char['top'] >= top])
+    if not runs:
+        return []
+
+    def column(run):
+        return min(max(bisect_right(columns, run[0]['x0']) - 1, 0), len(columns) - 2)
+
+    separators = []
+    if layout['strategy'] == 'lines':
+        separators = _row_separators(page, columns[0] - 1, columns[-1] + 1, top)
+    cells, tops = {}, {}
+    if len(separators) >= 2:
+        for run in runs:
+            middle = (run[0]['top'] + run[0]['bottom']) / 2
+            row = bisect_right(separators, middle)
+            # النصوص خارج الخطوط الأولى والأخيرة ليست من الجدول
+            if 0 < row < len(separators):
+                cells.setdefault((row, column(run)), []).extend(run)
+                tops[row] = separators[row - 1]
+        max_gap = None
+    else:
+        row, row_top = -1, None
+        for run in sorted(runs, key=lambda run: run[0]['top']):
+            if row_top is None or run[0]['top'] - row_top > Y_TOLERANCE:
+                row, row_top = row + 1, run[0]['top']
+                tops[row] = row_top
+            cells.setdefault((row, column(run)), []).extend(run)
+        max_gap = layout['row_height'] * MAX_ROW_GAP if layout.get('row_height') else None
+
+    product_col, quantity_col = layout['product_col'], layout['quantity_col']
+    rows = []
+    for row in sorted(tops):
+        product_chars = cells.get((row, product_col))
+        quantity_chars = cells.get((row, quantity_col))
+        rows.append((tops[row],
+                     _cell_text(product_chars) if product_chars else None,
+                     _cell_text(quantity_chars) if quantity_chars else None))
+    return _table_rows(rows, max_gap)
+
+
+def _extract_page(page, layout=None):
+    """استخراج ما في صفحة مفتوحة: {'page', 'rows', 'tables', 'text', 'timings'}"""
+    rows, tables, timings = [], [], {}
+    # الجداول والنص يستخدمان نفس الأحرف المحللة من الصفحة
+    started = time.perf_counter()
+    if layout is not None:
+        rows = _layout_rows(page, layout)
+        timings['table_region'] = time.perf_counter() - started
+    else:
+        tables = page.extract_tables() or []
+        timings['tables'] = time.perf_counter() - started
+    text = ''
+    if not rows:
+        text_started = time.perf_counter()
+        text = page.extract_text() or ''
+        timings['text'] = time.perf_counter() - text_started
+    return {'page': page.page_number - 1, 'rows': rows, 'tables': tables, 'text': text, 'timings': timings}
+
+
+def inspect_document(pdf_bytes):
+    """(عدد الصفحات، موضع جدول المنتجات أو None، الصفحات الأولى المستخرجة)
+
+    الصفحات التي فُتحت للبحث عن موضع الجدول تُستخرج هنا مباشرة (حتى صفحة الرؤوس، أو كل صفحات
+    البحث إذا لم يُعرف الموضع) فلا تُحلل مرة ثانية في مهام الاستخراج.
+    """
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        started = time.perf_counter()
+        layout = detect_layout(pdf)
+        detected = time.perf_counter() - started
+        opened = layout['page'] + 1 if layout is not None else min(LAYOUT_SEARCH_PAGES, len(pdf.pages))
+        pages = []
+        for page in pdf.pages[:opened]:
+            pages.append(_extract_page(page, layout))
+            page.close()
+        if pages:
+            pages[0]['timings']['layout'] = detected
+        return len(pdf.pages), layout, pages
+
+
+def extract_pages(pdf_bytes, start=0, stop=None, layout=None):
+    """فتح كل صفحة مرة واحدة واستخراج ما فيها من منتجات
+
+    مع layout تُقرأ صفوف الجدول من منطقته فقط ('rows')، ولا يُستخرج النص إلا من الصفحات التي
+    لم نجد فيها صفوفاً. بدونه تُستخرج كل الجداول والنص ('tables' و 'text').
+    يُرجع قائمة بعناصر {'page', 'rows', 'tables', 'text', 'timings'} بترتيب الصفحات.
+    timings: زمن كل مرحلة بالثواني (يُسجل في العملية الرئيسية عند تفعيل القياس).
+    """
+    pages = []
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        for number in range(start, min(stop or len(pdf.pages), len(pdf.pages))):
+            page = pdf.pages[number]
+            pages.append(_extract_page(page, layout))
+            page.close()
+    return pages
+
+
+def _record_page_timings(pages):
+    """تسجيل أزمنة الصفحات القادمة من العمليات الفرعية"""
+    if not metrics.is_enabled():
+        return
+    for page in pages:
+        for stage, seconds in page['timings'].items():
+            metrics.observe(f'pdf.extract_{stage}', seconds)
+    metrics.count('pdf.pages', len(pages))
+
+
+def _inspect_task(file_index, pdf_bytes):
+    """مهمة تُنفذ داخل عملية فرعية: عدد صفحات الملف وموضع جدوله وصفحاته الأولى"""
+    try:
+        return (file_index, *inspect_document(pdf_bytes), None)
+    except Exception as e:
+        return file_index, 0, None, [], str(e)
+
+
+def _extract_task(file_index, pdf_bytes, start, stop, layout=None):
+    """مهمة تُنفذ داخل عملية فرعية: استخراج مجموعة صفحات من ملف واحد"""
+    try:
+        return file_index, start, extract_pages(pdf_bytes, start, stop, layout), None
+    except Exception as e:
+        return file_index, start, [], str(e)
+
+
+@metrics.timed('pdf.parse_products')
+def products_from_pages(pages):
+    """تحويل صفحات الملف إلى منتجات بالترتيب، والطريقة تُختار لكل صفحة: صفوف منطقة الجدول، ثم
+    جداول الصفحة، ثم النص (الصفحات المتتالية التي لم نجد فيها جدولاً يُقرأ نصها معاً حتى يستمر
+    الجدول النصي بعد رؤوسه في صفحة سابقة)"""
+    products, text_pages = [], []
+
+    def flush_text():
+        if text_pages:
+            products.extend(extract_products_from_text(''.join(text + '\n' for text in text_pages)))
+            text_pages.clear()
+
+    for page in pages:
+        found = extract_products_from_rows(page.get('rows', ())) or extract_products_from_tables(page['tables'])
+        if found:
+            flush_text()
+            products.extend(found)
+        elif page['text']:
+            text_pages.append(page['text'])
+    flush_text()
+    return products
+
+
+def _get_pool(max_workers):
+    """مجموعة عمليات واحدة لكل عملية خادم (تُعاد إنشاؤها إذا تغير عدد العمليات المطلوب أو تعطلت)"""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != max_workers or _pool._broken:
+        _discard_pool()
+        # spawn بدلاً من fork لأن خادم Streamlit يعمل بعدة خيوط
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        _pool_workers = max_workers
+    return _pool
+
+
+def _discard_pool():
+    """إغلاق مجموعة العمليات الحالية حتى يُنشئ _get_pool غيرها"""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_workers = 0
+
+
+def _run_tasks(func, tasks, max_workers):
+    """تنفيذ func(*task) لكل مهمة وإرجاع النتائج بترتيب انتهائها
+
+    على مجموعة العمليات إذا كانت هناك أكثر من مهمة، وإلا في العملية الحالية (بدون تكلفة التشغيل).
+    إذا تعطلت المجموعة (مثلاً انتهت إحدى عملياتها فجأة) تُعاد إنشاؤها مرة واحدة وتُعاد المهام التي
+    لم تُرجع نتيجتها بعد.
+    """
+    if max_workers > 1 and len(tasks) > 1:
+        pending = dict(enumerate(tasks))
+        for attempt in range(2):
+            try:
+                pool = _get_pool(max_workers)
+                futures = {pool.submit(func, *task): index for index, task in pending.items()}
+                for future in as_completed(futures):
+                    result = future.result()
+                    del pending[futures[future]]
+                    yield result
+                return
+            except BrokenProcessPool:
+                _discard_pool()
+                if attempt:
+                    raise
+    else:
+        for task in tasks:
+            yield func(*task)
+
+
+def _plan_tasks(files, max_workers):
+    """تقسيم الملفات (فهرس الملف، (الاسم، المحتوى)) إلى مهام: مجموعات صفحات من كل ملف
+
+    أولاً يُحدد عدد صفحات كل ملف وموضع جدوله (ملف لكل عملية) وتُستخرج الصفحات التي فُتحت لذلك،
+    ثم تُقسم باقي الصفحات بحيث تعمل كل العمليات حتى مع ملف واحد طويل (بحد أقصى PAGES_PER_TASK
+    صفحة للمهمة). يُرجع (المهام، {فهرس الملف: الخطأ}، {فهرس الملف: الصفحات المستخرجة}).
+    """
+    documents = {}
+    errors = {}
+    inspected = {}
+    pdf_bytes_by_index = {file_index: pdf_bytes for file_index, (_, pdf_bytes) in files}
+    for file_index, page_count, layout, pages, error in _run_tasks(
+            _inspect_task, list(pdf_bytes_by_index.items()), max_workers):
+        if error:
+            errors[file_index] = error
+        else:
+            documents[file_index] = (page_count, layout)
+            inspected[file_index] = pages
+
+    remaining = sum(page_count - len(inspected[file_index])
+                    for file_index, (page_count, _) in documents.items())
+    pages_per_task = max(1, min(PAGES_PER_TASK, -(-remaining // max_workers)))
+    tasks = []
+    for file_index, (page_count, layout) in sorted(documents.items()):
+        for start in range(len(inspected[file_index]), page_count, pages_per_task):
+            tasks.append((file_index, pdf_bytes_by_index[file_index], start, start + pages_per_task, layout))
+    return tasks, errors, inspected
+
+
+def products_cache_key(file_hash):
+    """مفتاح نتائج استخراج المنتجات لملف معين"""
+    return make_key('products', file_hash, EXTRACTOR_VERSION)
+
+
+@metrics.timed('pdf.process_files')
+def process_invoice_files(files, max_workers=None, progress_callback=None, cache=None):
+    """معالجة ملفات الفواتير على عدة عمليات
+
+    files: قائمة (اسم الملف، محتوى الملف كـ bytes).
+    progress_callback(done, total): يُستدعى بعد انتهاء كل مهمة.
+    cache: ResultCache اختياري؛ الملفات التي سبقت قراءتها لا يُعاد تحليلها.
+    يُرجع قائمة بنفس ترتيب الملفات: {'file_name', 'content_hash', 'products', 'error', 'cached'}.
+    """
+    hashes = [content_hash(pdf_bytes) for _, pdf_bytes in files]
+    cached_products = {}
+    if cache is not None:
+        for file_index, file_hash in enumerate(hashes):
+            products = cache.get(products_cache_key(file_hash))
+            if products is not None:
+                cached_products[file_index] = products
+        metrics.count('pdf.cache_hits', len(cached_products))
+
+    pending = [(i, f) for i, f in enumerate(files) if i not in cached_products]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, max_workers)
+
+    with metrics.timer('pdf.plan'):
+        tasks, errors, inspected = _plan_tasks(pending, max_workers)
+    total = len(tasks)
+    chunks = {}
+    for file_index, pages in inspected.items():
+        _record_page_timings(pages)
+        chunks[(file_index, 0)] = (pages, None)
+    # ملف صغير واحد (مهمة واحدة): لا داعي لتكلفة تشغيل العمليات الفرعية
+    for done, (file_index, start, pages, error) in enumerate(
+            _run_tasks(_extract_task, tasks, max_workers), start=1):
+        _record_page_timings(pages)
+        chunks[(file_index, start)] = (pages, error)
+        if progress_callback:
+            progress_callback(done, total)
+
+    results = []
+    for file_index, (name, _) in enumerate(files):
+        if file_index in cached_products:
+            results.append({
+                'file_name': name,
+                'content_hash': hashes[file_index],
+                'products': cached_products[file_index],
+                'error': None,
+                'cached': True,
+            })
+            continue
+
+        pages = []
+        error = errors.get(file_index)
+        for key in sorted(k for k in chunks if k[0] == file_index):
+            chunk_pages, chunk_error = chunks[key]
+            pages.extend(chunk_pages)
+            error = error or chunk_error
+        products = products_from_pages(pages)
+        # لا نخزن نتائج الملفات التي فشلت قراءتها
+        if cache is not None and not error:
+            cache.set(products_cache_key(hashes[file_index]), products)
+        results.append({
+            'file_name': name,
+            'content_hash': hashes[file_index],
+            'products': products,
+            'error': error,
+            'cached': False,
+        })
+    return results
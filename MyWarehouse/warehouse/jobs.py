@@ -0,0 +1,241 @@
+"""قائمة مهام خلفية دائمة للعمليات الطويلة (قراءة الفواتير ومطابقتها، ملفات التصدير الكبيرة)
+
+المهمة تُسجل في جدول SQLite (jobs.db) وتُنفذ على مجموعة خيوط داخل عملية الخادم، فلا تتوقف
+جلسة المستخدم أثناء التنفيذ ولا تضيع النتيجة إذا أُعيد تشغيل الصفحة أو انقطع الاتصال.
+الواجهة تقرأ الحالة ونسبة التقدم من الجدول، والنتائج مشتركة بين جميع الجلسات: المهمة بنفس
+المفتاح (key) لا تُنفذ مرة ثانية ما دامت قيد التنفيذ أو انتهت بنجاح.
+
+ملفات المدخلات (محتوى الفواتير مثلاً) والمخرجات (ملفات التصدير) تُحفظ في مجلد لكل مهمة بجانب
+قاعدة البيانات. المهام التي انقطعت بإيقاف الخادم تُعاد إلى القائمة عند التشغيل التالي.
+يُفترض أن عملية خادم واحدة فقط تستخدم نفس jobs.db.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from warehouse import metrics
+
+DEFAULT_JOBS_PATH = 'jobs.db'
+DEFAULT_WORKERS = 2
+# أقل فترة بين كتابتين لنسبة التقدم في قاعدة البيانات (بالثواني)
+PROGRESS_INTERVAL = 0.5
+# المهام المنتهية الأقدم من ذلك تُحذف مع ملفاتها
+KEEP_SECONDS = 7 * 24 * 3600
+# أقل فترة بين عمليتي تنظيف أثناء عمل الخادم (التنظيف يتم عند إضافة المهام)
+CLEANUP_INTERVAL = 3600
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+COLUMNS = ('id', 'kind', 'key', 'label', 'status', 'done', 'total', 'message',
+           'created', 'started', 'finished', 'params', 'result', 'error')
+
+
+class Job:
+    """ما يصل إلى دالة تنفيذ المهمة: المعاملات، ملفات المدخلات والمخرجات، وتسجيل التقدم"""
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row['id']
+        self.kind = row['kind']
+        self.params = row['params']
+        self.directory = queue.job_directory(self.id)
+        self._last_progress = 0.0
+
+    def read_input(self, name):
+        with open(os.path.join(self.directory, 'input', name), 'rb') as f:
+            return f.read()
+
+    def write_output(self, name, data):
+        """حفظ ملف ناتج (يُقرأ لاحقاً بـ JobQueue.read_output)"""
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(data)
+        return name
+
+    def progress(self, done, total, message=None):
+        """تسجيل التقدم (لا يُكتب أكثر من مرة كل PROGRESS_INTERVAL إلا عند الانتهاء أو تغير الرسالة)"""
+        now = time.monotonic()
+        if message is None and done < total and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.queue._update(self.id, done=done, total=total, message=message)
+
+
+class JobQueue:
+    """جدول المهام ومجموعة الخيوط التي تنفذها
+
+    handlers: {نوع المهمة: دالة(job) -> نتيجة قابلة للتحويل إلى JSON}.
+    keep_seconds: {نوع المهمة: مدة الاحتفاظ بالثواني} للأنواع التي تختلف عن KEEP_SECONDS
+    (ملفات التصدير الكبيرة مثلاً لا فائدة منها بعد تغير البيانات).
+    """
+
+    def __init__(self, handlers, path=DEFAULT_JOBS_PATH, max_workers=DEFAULT_WORKERS, keep_seconds=None):
+        self.handlers = dict(handlers)
+        self.path = path
+        self.files_path = f'{path}.files'
+        self.keep_seconds = dict(keep_seconds or {})
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        os.makedirs(self.files_path, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    key TEXT,
+                    label TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_kind_key ON jobs(kind, key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warehouse-job')
+        self.cleanup()
+        self._resume()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def job_directory(self, job_id):
+        return os.path.join(self.files_path, str(job_id))
+
+    def _resume(self):
+        """إعادة المهام التي لم تكتمل (توقف الخادم أثناء تنفيذها) إلى القائمة"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING))
+            pending = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY id", (QUEUED,))]
+        for job_id in pending:
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, kind, params=None, inputs=None, key=None, label=''):
+        """إضافة مهمة وإرجاع رقمها
+
+        inputs: {اسم الملف: bytes} تُحفظ على القرص قبل بدء المهمة.
+        key: إذا وُجدت مهمة من نفس النوع بنفس المفتاح قيد التنفيذ أو ناجحة يُرجع رقمها بدون مهمة جديدة.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"نوع مهمة غير معروف: {kind}")
+        if time.monotonic() - self._last_cleanup >= CLEANUP_INTERVAL:
+            self.cleanup()
+        with self._lock:
+            if key is not None:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT id FROM jobs WHERE kind = ? AND key = ? AND status IN (?, ?, ?) "
+                        "ORDER BY id DESC LIMIT 1",
+                        (kind, key, QUEUED, RUNNING, DONE),
+                    ).fetchone()
+                if row is not None:
+                    metrics.count('jobs.reused')
+                    return row['id']
+            with self._connect() as conn:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, key, label, status, created, params) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, key, label, QUEUED, time.time(), json.dumps(params or {}, ensure_ascii=False)),
+                ).lastrowid
+            input_dir = os.path.join(self.job_directory(job_id), 'input')
+            os.makedirs(input_dir, exist_ok=True)
+            for name, data in (inputs or {}).items():
+                with open(os.path.join(input_dir, name), 'wb') as f:
+                    f.write(data)
+        metrics.count('jobs.submitted')
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _update(self, job_id, **values):
+        assignments = ', '.join(f'{column} = ?' for column in values)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+
+    def _run(self, job_id):
+        with self._connect() as conn:
+            # حجز المهمة: لا تُنفذ مرتين إذا أُضيفت للخيوط أكثر من مرة
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED),
+            ).rowcount
+            row = self._row(conn, job_id) if claimed else None
+        if row is None:
+            return
+        job = Job(self, row)
+        try:
+            with metrics.timer(f'job.{job.kind}'):
+                result = self.handlers[job.kind](job)
+        except Exception as e:
+            metrics.count('jobs.failed')
+            self._update(job_id, status=FAILED, finished=time.time(), error=str(e) or type(e).__name__)
+        else:
+            self._update(job_id, status=DONE, finished=time.time(),
+                         result=json.dumps(result, ensure_ascii=False))
+        # المدخلات لم تعد لازمة (المخرجات تبقى حتى حذف المهمة)
+        shutil.rmtree(os.path.join(job.directory, 'input'), ignore_errors=True)
+
+    def _row(self, conn, job_id):
+        row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def get(self, job_id):
+        """حالة المهمة كـ dict (أو None إذا حُذفت)"""
+        with self._connect() as conn:
+            return self._row(conn, job_id)
+
+    def recent(self, kind=None, limit=10):
+        """آخر المهام من جميع الجلسات (بدون النتائج)"""
+        columns = ', '.join(column for column in COLUMNS if column not in ('params', 'result'))
+        query = f"SELECT {columns} FROM jobs"
+        args = []
+        if kind is not None:
+            query += " WHERE kind = ?"
+            args.append(kind)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY id DESC LIMIT ?", (*args, limit))]
+
+    def read_output(self, job_id, name):
+        with open(os.path.join(self.job_directory(job_id), name), 'rb') as f:
+            return f.read()
+
+    def cleanup(self, max_age=KEEP_SECONDS):
+        """حذف المهام المنتهية الأقدم من max_age ثانية (أو مدة نوعها في keep_seconds) مع ملفاتها"""
+        self._last_cleanup = time.monotonic()
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, finished FROM jobs WHERE status IN (?, ?) AND finished < ?",
+                (DONE, FAILED, now - min(max_age, *self.keep_seconds.values())))
+            old = [row['id'] for row in rows
+                   if row['finished'] < now - self.keep_seconds.get(row['kind'], max_age)]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in old])
+        for job_id in old:
+            shutil.rmtree(self.job_directory(job_id), ignore_errors=True)
+        return len(old)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
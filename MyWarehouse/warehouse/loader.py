@@ -0,0 +1,107 @@
+"""تحميل جداول المخزن والمبيعات مع ذاكرة مؤقتة مشتركة تُحدّث فقط عند تغير البيانات
+
+بسبب طريقة Streamlit في إعادة تشغيل السكربت مع كل تفاعل، كانت الجداول تُقرأ وتُحلل من جديد
+في كل مرة. هنا تُحفظ الجداول المحللة في الذاكرة وتُستخدم ما دام عداد إصدار الجدول في قاعدة
+البيانات لم يتغير (استعلام واحد صغير بدلاً من قراءة الجدول كاملاً).
+
+سجل المبيعات يُحمّل من لقطة Arrow معينة في الذاكرة (warehouse.columnar) إذا كانت pyarrow
+متاحة، وأسماء الأصناف في الجدولين فئات من نفس قاموس الأصناف فلا تتكرر في الذاكرة.
+
+الجداول المُرجعة مشتركة بين الجلسات: يجب عدم تعديلها مباشرة (استخدم .copy() عند الحاجة).
+"""
+import threading
+
+import pandas as pd
+
+from warehouse import columnar, metrics
+
+
+def type_inventory(inventory_df, categories=None):
+    """أنواع أعمدة المخزن: الأسماء كفئات، والكميات float64 حتى تبقى مقارنات الرصيد دقيقة
+
+    categories: أسماء قاموس الأصناف (pd.Index) لمشاركتها مع سجل المبيعات بدلاً من نسخة جديدة.
+    """
+    if categories is not None:
+        codes = categories.get_indexer(inventory_df['الصنف'].astype(object))
+        if (codes >= 0).all():
+            inventory_df = inventory_df.assign(
+                الصنف=pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories)))
+    return inventory_df.astype({
+        'الصنف': 'category',
+        'الافتتاحي': 'float64',
+        'المتبقي': 'float64',
+    })
+
+
+def type_sales(sales_df):
+    """أنواع أعمدة المبيعات: التاريخ يُحلل مرة واحدة، الأسماء كفئات، والأمتار float32"""
+    sales_df = sales_df.astype({
+        'الصنف': 'category',
+        'أمتار': 'float32',
+        'ملاحظة': 'category',
+    })
+    sales_df['التاريخ'] = pd.to_datetime(sales_df['التاريخ'], format='ISO8601')
+    return sales_df
+
+
+class DataLoader:
+    """ذاكرة مؤقتة لجداول WarehouseStore مفتاحها رقم إصدار كل جدول"""
+
+    def __init__(self, store, snapshot=True):
+        self.store = store
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._items = None
+        self._snapshot = columnar.SalesSnapshot(store) if snapshot and columnar.available() else None
+
+    def _load(self, name, version, read):
+        cached = self._frames.get(name)
+        if cached is not None and cached[0] == version:
+            metrics.count('loader.hits')
+            return cached[1]
+        with self._lock:
+            cached = self._frames.get(name)
+            if cached is not None and cached[0] == version:
+                metrics.count('loader.hits')
+                return cached[1]
+            metrics.count('loader.misses')
+            with metrics.timer(f'loader.{name}'):
+                frame = read()
+            self._frames[name] = (version, frame)
+            return frame
+
+    def _item_categories(self):
+        """(أرقام قاموس الأصناف، أسماؤها كـ pd.Index) يُعاد بناؤها فقط عند إضافة أسماء جديدة"""
+        last_id = self.store.last_item_id()
+        if self._items is None or self._items[0] != last_id:
+            names = self.store.item_names()
+            self._items = (last_id, names.index.to_numpy(dtype='int64'), pd.Index(names.to_numpy(), dtype=object))
+        return self._items[1], self._items[2]
+
+    def _read_inventory(self):
+        return type_inventory(self.store.inventory_frame(), self._item_categories()[1])
+
+    def _read_sales(self):
+        if self._snapshot is None:
+            return type_sales(self.store.sales_frame())
+        # القاموس يُقرأ بعد اللقطة حتى يشمل أرقام كل الحركات فيها
+        table = self._snapshot.table()
+        return columnar.sales_frame(table, *self._item_categories())
+
+    def inventory(self):
+        """جدول المخزن (من الذاكرة إذا لم يتغير)"""
+        inventory_version, _ = self.store.versions()
+        return self._load('inventory', inventory_version, self._read_inventory)
+
+    def sales(self):
+        """سجل المبيعات (من الذاكرة إذا لم يتغير)"""
+        _, sales_version = self.store.versions()
+        return self._load('sales', sales_version, self._read_sales)
+
+    def frames(self):
+        """المخزن والمبيعات معاً باستعلام إصدار واحد"""
+        inventory_version, sales_version = self.store.versions()
+        return (
+            self._load('inventory', inventory_version, self._read_inventory),
+            self._load('sales', sales_version, self._read_sales),
+        )
@@ -0,0 +1,149 @@
+"""مطابقة أسماء المنتجات في الفواتير مع أصناف المخزن باستخدام فهرس مُعد مسبقاً"""
+import copy
+import hashlib
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from warehouse import metrics
+
+NGRAM_SIZE = 3
+SHORTLIST_SIZE = 40
+
+
+def normalize_name(name):
+    """توحيد شكل الاسم قبل المقارنة (نفس معالجة similarity_score)"""
+    return str(name).lower().strip()
+
+
+def _index_key(name):
+    """شكل مبسط للاسم يُستخدم في الفهرس فقط (إزالة الرموز والمسافات الزائدة)"""
+    text = re.sub(r'[^\w]+', ' ', normalize_name(name))
+    return ' '.join(text.split())
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    """تقطيع النص إلى مقاطع حرفية بطول n"""
+    padded = f' {text} '
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def similarity_score(str1, str2):
+    """حساب درجة التشابه بين نصين"""
+    return SequenceMatcher(None, normalize_name(str1), normalize_name(str2)).ratio()
+
+
+def inventory_version(names):
+    """بصمة لقائمة الأصناف تتغير عند أي تعديل على الأسماء أو ترتيبها"""
+    digest = hashlib.sha1()
+    for name in names:
+        digest.update(str(name).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# طرق المطابقة التي يرجعها ProductMatcher.resolve
+ALIAS, EXACT, FUZZY, UNMATCHED = 'alias', 'exact', 'fuzzy', 'none'
+
+
+class ProductMatcher:
+    """فهرس مطابقة يُبنى مرة واحدة لكل نسخة من المخزن ويُعاد استخدامه لكل الفواتير
+
+    aliases: {اسم الفاتورة الموحد: اسم الصنف} أسماء متعلمة تُفحص قبل أي مقارنة تقريبية.
+    """
+
+    @metrics.timed('match.build_index')
+    def __init__(self, names, shortlist_size=SHORTLIST_SIZE, aliases=None):
+        self.names = [str(name) for name in names]
+        self._names_version = inventory_version(self.names)
+        self.aliases = {}
+        self.version = self._names_version
+        self.shortlist_size = shortlist_size
+        self._normalized = [normalize_name(name) for name in self.names]
+
+        # الاسم الموحد -> أول فهرس (للحفاظ على نفس ترتيب الاختيار عند التساوي)
+        self._exact = {}
+        # المقطع الحرفي -> قائمة فهارس الأصناف التي تحتويه
+        self._postings = defaultdict(list)
+        for idx, norm in enumerate(self._normalized):
+            self._exact.setdefault(norm, idx)
+            for gram in _ngrams(_index_key(norm)):
+                self._postings[gram].append(idx)
+
+        if aliases:
+            self._set_aliases(aliases)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _set_aliases(self, aliases):
+        self.aliases = dict(aliases)
+        # نتائج المطابقة المحفوظة تعتمد على الأسماء المتعلمة أيضاً
+        self.version = inventory_version([self._names_version, *sorted(
+            f'{alias}\0{name}' for alias, name in self.aliases.items())])
+
+    def with_aliases(self, aliases):
+        """نسخة تشترك في نفس الفهرس مع أسماء متعلمة مختلفة (بدون إعادة بناء الفهرس)"""
+        matcher = copy.copy(self)
+        matcher._set_aliases(aliases)
+        return matcher
+
+    def shortlist(self, product_name):
+        """اختيار الأصناف المرشحة حسب عدد المقاطع المشتركة مع اسم المنتج"""
+        counts = defaultdict(int)
+        for gram in _ngrams(_index_key(product_name)):
+            for idx in self._postings.get(gram, ()):
+                counts[idx] += 1
+        if not counts:
+            return []
+        top = sorted(counts, key=lambda idx: (-counts[idx], idx))[:self.shortlist_size]
+        # الترتيب حسب موقع الصنف في المخزن مثل البحث الخطي الأصلي
+        return sorted(top)
+
+    def match(self, product_name, threshold=0.6):
+        """إرجاع (اسم الصنف المطابق أو None، درجة التطابق)"""
+        matched, score, _ = self.resolve(product_name, threshold)
+        return matched, score
+
+    @metrics.timed('match.product')
+    def resolve(self, product_name, threshold=0.6):
+        """إرجاع (اسم الصنف المطابق أو None، درجة التطابق، طريقة المطابقة)"""
+        if not self.names:
+            return None, 0, UNMATCHED
+
+        query = normalize_name(product_name)
+        alias = self.aliases.get(query)
+        if alias is not None:
+            # الاسم المتعلم يُستخدم فقط إذا كان صنفه ما زال في المخزن
+            alias_idx = self._exact.get(normalize_name(alias))
+            if alias_idx is not None:
+                metrics.count('match.alias_hits')
+                return self.names[alias_idx], 1.0, ALIAS
+        exact_idx = self._exact.get(query)
+        if exact_idx is not None:
+            return self.names[exact_idx], 1.0, EXACT
+
+        candidates = self.shortlist(product_name)
+        if not candidates:
+            # لا توجد مقاطع مشتركة (أسماء قصيرة جداً مثلاً): نرجع للبحث الكامل
+            candidates = range(len(self.names))
+
+        # نضع اسم المنتج كتسلسل ثانٍ حتى يُحسب فهرسه مرة واحدة فقط
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(query)
+        best_idx = None
+        best_score = 0
+        for idx in candidates:
+            matcher.set_seq1(self._normalized[idx])
+            if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score = score
+                best_idx = idx
+
+        if best_idx is not None and best_score >= threshold:
+            return self.names[best_idx], best_score, FUZZY
+        return None, best_score, UNMATCHED
@@ -0,0 +1,167 @@
+"""قياس زمن المراحل الحساسة للأداء (قراءة PDF، المطابقة، قاعدة البيانات، التصدير...)
+
+القياس معطل افتراضياً وتكلفته عندها فحص متغير واحد فقط. يُفعّل بمتغير البيئة
+WAREHOUSE_METRICS=1 أو من لوحة الإدارة في صفحة الإعدادات (set_enabled).
+النتائج خاصة بالعملية الحالية (مشتركة بين جميع الجلسات) ويمكن عرضها كـ JSON أو
+بصيغة Prometheus النصية.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# حدود فئات المدرج التكراري بالثواني
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_enabled = os.environ.get('WAREHOUSE_METRICS', '').lower() in ('1', 'true', 'yes')
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    """توزيع أزمنة مرحلة واحدة على فئات ثابتة"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """قيمة تقريبية (الحد الأعلى للفئة) للنسبة المئوية q"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, bucket in zip(BUCKETS, self.buckets):
+            seen += bucket
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {str(bound): n for bound, n in zip(BUCKETS, self.buckets)},
+        }
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    """تفعيل أو تعطيل القياس لكل الجلسات في هذه العملية"""
+    global _enabled
+    _enabled = bool(value)
+
+
+def observe(stage, seconds):
+    """تسجيل زمن مرحلة تم قياسه مسبقاً (مثلاً داخل عملية فرعية)"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+
+def count(name, amount=1):
+    """زيادة عداد أحداث (إصابة الذاكرة المؤقتة مثلاً)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timer(stage):
+    """قياس زمن كتلة كود"""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """مزخرف لقياس زمن كل استدعاء للدالة"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def reset():
+    """مسح كل القياسات"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """نسخة من القياسات الحالية: {'stages': {...}, 'counters': {...}}"""
+    with _lock:
+        return {
+            'enabled': _enabled,
+            'stages': {stage: histogram.to_dict() for stage, histogram in sorted(_histograms.items())},
+            'counters': dict(sorted(_counters.items())),
+        }
+
+
+def to_json():
+    return json.dumps(snapshot(), ensure_ascii=False, indent=2)
+
+
+def to_prometheus():
+    """القياسات بصيغة Prometheus النصية"""
+    data = snapshot()
+    lines = [
+        '# HELP warehouse_stage_seconds Latency of warehouse processing stages.',
+        '# TYPE warehouse_stage_seconds histogram',
+    ]
+    for stage, values in data['stages'].items():
+        cumulative = 0
+        for bound, n in values['buckets'].items():
+            cumulative += n
+            le = '+Inf' if bound == 'inf' else bound
+            lines.append(f'warehouse_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'warehouse_stage_seconds_sum{{stage="{stage}"}} {values["sum"]}')
+        lines.append(f'warehouse_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+    lines.append('# HELP warehouse_events_total Counters of warehouse events.')
+    lines.append('# TYPE warehouse_events_total counter')
+    for name, value in data['counters'].items():
+        lines.append(f'warehouse_events_total{{name="{name}"}} {value}')
+    return '\n'.join(lines) + '\n'
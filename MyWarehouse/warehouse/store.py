@@ -0,0 +1,783 @@
+"""مخزن البيانات الدائم (SQLite): أصناف المخزن وسجل المبيعات
+
+كل عملية سحب تُضاف كسجل جديد داخل معاملة واحدة مع سجل كتابة مسبقة (WAL) يُزامن مع القرص،
+فتكلفة السحب ثابتة مهما كبر سجل المبيعات بدلاً من إعادة كتابة ملف CSV كاملاً.
+"""
+import os
+import sqlite3
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from warehouse import metrics
+from warehouse.matching import normalize_name
+
+DEFAULT_DB_PATH = 'warehouse.db'
+INVENTORY_COLUMNS = ['الصنف', 'الافتتاحي', 'المتبقي']
+SALES_COLUMNS = ['التاريخ', 'الصنف', 'أمتار', 'ملاحظة']
+
+# عدد محاولات الخصم عند تعارض تعديلين متزامنين على نفس الصنف
+MAX_RETRIES = 20
+
+# أيام الأسبوع بترتيب strftime('%w') في SQLite (0 = الأحد)
+WEEKDAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+# إعادة بناء التجميعات المسبقة للمبيعات من جدول المبيعات كاملاً
+ROLLUPS_REBUILD = """
+    DELETE FROM sales_by_item;
+    DELETE FROM sales_by_day;
+    DELETE FROM sales_by_weekday;
+    INSERT INTO sales_by_item (item_id, item, meters, count)
+        SELECT sales.item_id, items.name, SUM(sales.meters), COUNT(*)
+        FROM sales JOIN items ON items.id = sales.item_id GROUP BY sales.item_id;
+    INSERT INTO sales_by_day (day, meters, count)
+        SELECT day, SUM(meters), COUNT(*) FROM sales GROUP BY day;
+    INSERT INTO sales_by_weekday (weekday, meters, count)
+        SELECT weekday, SUM(meters), COUNT(*) FROM sales GROUP BY weekday;
+"""
+
+# تحديث التجميعات مع كل حركة جديدة؛ المعاملات بالاسم: ts, item_id, item, meters
+ROLLUPS_ADD = [
+    """
+    INSERT INTO sales_by_item (item_id, item, meters, count) VALUES (:item_id, :item, :meters, 1)
+    ON CONFLICT(item_id) DO UPDATE SET meters = meters + excluded.meters, count = count + 1
+    """,
+    """
+    INSERT INTO sales_by_day (day, meters, count) VALUES (substr(:ts, 1, 10), :meters, 1)
+    ON CONFLICT(day) DO UPDATE SET meters = meters + excluded.meters, count = count + 1
+    """,
+    """
+    INSERT INTO sales_by_weekday (weekday, meters, count) VALUES (CAST(strftime('%w', :ts) AS INTEGER), :meters, 1)
+    ON CONFLICT(weekday) DO UPDATE SET meters = meters + excluded.meters, count = count + 1
+    """,
+]
+
+# كل عنصر ينقل قاعدة البيانات من الإصدار i إلى i+1 (PRAGMA user_version)
+MIGRATIONS = [
+    """
+    CREATE TABLE inventory (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        opening REAL NOT NULL DEFAULT 0,
+        remaining REAL NOT NULL DEFAULT 0
+    );
+    CREATE INDEX inventory_name ON inventory(name);
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        item TEXT NOT NULL,
+        meters REAL NOT NULL,
+        note TEXT NOT NULL DEFAULT ''
+    );
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    # رقم إصدار لكل صنف للقفل المتفائل (optimistic locking) عند الخصم المتزامن
+    """
+    ALTER TABLE inventory ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    """,
+    # تجميعات مسبقة للمبيعات (حسب الصنف واليوم ويوم الأسبوع) تُحدّث مع كل حركة
+    """
+    CREATE TABLE sales_by_item (
+        item TEXT PRIMARY KEY,
+        meters REAL NOT NULL,
+        count INTEGER NOT NULL
+    );
+    CREATE TABLE sales_by_day (
+        day TEXT PRIMARY KEY,
+        meters REAL NOT NULL,
+        count INTEGER NOT NULL
+    );
+    CREATE TABLE sales_by_weekday (
+        weekday INTEGER PRIMARY KEY,
+        meters REAL NOT NULL,
+        count INTEGER NOT NULL
+    );
+    INSERT INTO sales_by_item (item, meters, count)
+        SELECT item, SUM(meters), COUNT(*) FROM sales GROUP BY item;
+    INSERT INTO sales_by_day (day, meters, count)
+        SELECT substr(ts, 1, 10), SUM(meters), COUNT(*) FROM sales GROUP BY substr(ts, 1, 10);
+    INSERT INTO sales_by_weekday (weekday, meters, count)
+        SELECT CAST(strftime('%w', ts) AS INTEGER), SUM(meters), COUNT(*) FROM sales
+        GROUP BY CAST(strftime('%w', ts) AS INTEGER);
+    """,
+    # فهارس لعرض المبيعات على صفحات مع التصفية حسب التاريخ والصنف
+    """
+    CREATE INDEX sales_ts ON sales(ts);
+    CREATE INDEX sales_item_ts ON sales(item, ts);
+    """,
+    # التاريخ ويوم الأسبوع محسوبان مسبقاً لكل حركة ومفهرسان، فاستعلامات اليوم والفترة
+    # ويوم الأسبوع تقرأ الحركات المطلوبة فقط بدلاً من تحليل تواريخ السجل كاملاً
+    """
+    ALTER TABLE sales ADD COLUMN day TEXT;
+    ALTER TABLE sales ADD COLUMN weekday INTEGER;
+    UPDATE sales SET day = substr(ts, 1, 10), weekday = CAST(strftime('%w', ts) AS INTEGER);
+    CREATE INDEX sales_day ON sales(day);
+    CREATE INDEX sales_weekday_day ON sales(weekday, day);
+    """,
+    # قاموس أسماء الأصناف: كل حركة تشير إلى الصنف برقم صحيح بدلاً من تكرار الاسم في كل سطر
+    # (قاعدة بيانات أصغر، وتحميل السجل كأعمدة أرقام يشترك فيها المخزن والمبيعات في نفس الأسماء)
+    """
+    CREATE TABLE items (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    INSERT OR IGNORE INTO items (name) SELECT name FROM inventory ORDER BY id;
+    INSERT OR IGNORE INTO items (name) SELECT item FROM sales ORDER BY id;
+    CREATE TABLE sales_new (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        item_id INTEGER NOT NULL REFERENCES items(id),
+        meters REAL NOT NULL,
+        note TEXT NOT NULL DEFAULT '',
+        day TEXT NOT NULL,
+        weekday INTEGER NOT NULL
+    );
+    INSERT INTO sales_new (id, ts, item_id, meters, note, day, weekday)
+        SELECT sales.id, sales.ts, items.id, sales.meters, sales.note, sales.day, sales.weekday
+        FROM sales JOIN items ON items.name = sales.item ORDER BY sales.id;
+    DROP TABLE sales;
+    ALTER TABLE sales_new RENAME TO sales;
+    CREATE INDEX sales_day ON sales(day);
+    CREATE INDEX sales_weekday_day ON sales(weekday, day);
+    CREATE INDEX sales_item_day ON sales(item_id, day);
+    DROP TABLE sales_by_item;
+    CREATE TABLE sales_by_item (
+        item_id INTEGER PRIMARY KEY,
+        item TEXT NOT NULL,
+        meters REAL NOT NULL,
+        count INTEGER NOT NULL
+    );
+    INSERT INTO sales_by_item (item_id, item, meters, count)
+        SELECT sales.item_id, items.name, SUM(sales.meters), COUNT(*)
+        FROM sales JOIN items ON items.id = sales.item_id GROUP BY sales.item_id;
+    """,
+    # أسماء المنتجات كما تكتبها فواتير الموردين (بعد normalize_name) -> الصنف في المخزن
+    """
+    CREATE TABLE aliases (
+        alias TEXT PRIMARY KEY,
+        item_id INTEGER NOT NULL REFERENCES items(id),
+        source TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        updated TEXT NOT NULL,
+        last_used TEXT
+    );
+    """,
+    # أرقام الأصناف لا يُعاد استخدامها بعد المسح أو الاستبدال (AUTOINCREMENT)، حتى لا يطابق خصم
+    # قُرئ قبل المسح (رقم الصنف ورقم إصداره) صنفاً جديداً أخذ نفس الرقم
+    """
+    CREATE TABLE inventory_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        opening REAL NOT NULL DEFAULT 0,
+        remaining REAL NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO inventory_new (id, name, opening, remaining, version)
+        SELECT id, name, opening, remaining, version FROM inventory ORDER BY id;
+    DROP TABLE inventory;
+    ALTER TABLE inventory_new RENAME TO inventory;
+    CREATE INDEX inventory_name ON inventory(name);
+    """,
+]
+
+# إضافة حركة مع حساب التاريخ ويوم الأسبوع من الوقت؛ المعاملات: (ts, item_id, meters, note)
+SALES_INSERT = """
+    INSERT INTO sales (ts, item_id, meters, note, day, weekday)
+    VALUES (?1, ?2, ?3, ?4, substr(?1, 1, 10), CAST(strftime('%w', ?1) AS INTEGER))
+"""
+
+
+class ConcurrentUpdateError(Exception):
+    """تعذر الخصم بعد عدة محاولات بسبب تعديلات متزامنة على نفس الصنف"""
+
+
+def _now():
+    return pd.Timestamp.now().isoformat(sep=' ')
+
+
+def _like_pattern(text):
+    """نمط LIKE للبحث عن جزء من الاسم (مع تعطيل الرموز الخاصة % و _)"""
+    escaped = str(text).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def plan_batch_deduction(items, quantities, remaining_by_name):
+    """تحديد أسطر الدفعة القابلة للخصم بخطوة واحدة (بدون البحث عن كل صنف في المخزن على حدة)
+
+    remaining_by_name: Series (اسم الصنف -> الكمية المتبقية).
+    الأسطر المكررة لنفس الصنف تُجمع بالترتيب: يُقبل السطر إذا كان مجموع الكميات حتى هذا
+    السطر لا يتجاوز المتاح.
+    يُرجع DataFrame بالأعمدة: item, quantity, available, deductible.
+    """
+    lines = pd.DataFrame({'item': list(items), 'quantity': list(quantities)}, columns=['item', 'quantity'])
+    lines['quantity'] = lines['quantity'].astype(float)
+    lines['available'] = lines['item'].map(remaining_by_name).astype(float).fillna(0.0)
+    cumulative = lines.groupby('item', sort=False)['quantity'].cumsum()
+    # هامش صغير لأخطاء جمع الأعداد العشرية
+    lines['deductible'] = cumulative <= lines['available'] + 1e-9
+    return lines
+
+
+def _float(value):
+    return 0.0 if pd.isna(value) else float(value)
+
+
+class WarehouseStore:
+    """واجهة القراءة والكتابة على قاعدة بيانات المخزن"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, inventory_csv='inventory.csv', sales_csv='sales.csv'):
+        self.path = path
+        self._local = threading.local()
+        with self.transaction() as conn:
+            self._migrate(conn)
+        self._import_csv_once(inventory_csv, sales_csv)
+
+    # --- الاتصال والمعاملات ---
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: مزامنة سجل WAL مع القرص عند كل معاملة
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """معاملة كتابة واحدة: إما أن تُطبق كل التغييرات أو لا يُطبق شيء"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _execute_script(self, conn, script):
+        # executescript ينهي المعاملة الحالية، لذلك تُنفذ الأوامر واحداً واحداً
+        for statement in script.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+
+    def _migrate(self, conn):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version, len(MIGRATIONS)):
+            self._execute_script(conn, MIGRATIONS[target])
+            conn.execute(f"PRAGMA user_version = {target + 1}")
+
+    def _get_meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _bump_version(self, conn, *tables):
+        """زيادة عداد إصدار الجداول المعدلة (تعتمد عليه الذاكرة المؤقتة في DataLoader)"""
+        for table in tables:
+            conn.execute(
+                """
+                INSERT INTO meta (key, value) VALUES (?, 1)
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                """,
+                (f'{table}_version',),
+            )
+
+    def versions(self):
+        """أرقام إصدار الجداول: تتغير مع كل كتابة من أي جلسة أو عملية"""
+        rows = self._connection().execute(
+            "SELECT key, value FROM meta WHERE key IN ('inventory_version', 'sales_version')").fetchall()
+        values = dict(rows)
+        return int(values.get('inventory_version', 0)), int(values.get('sales_version', 0))
+
+    def names_version(self):
+        """يتغير فقط عند إضافة أسماء أصناف أو حذفها (وليس مع كل خصم مثل رقم إصدار المخزن)"""
+        return int(self._get_meta(self._connection(), 'names_version', 0))
+
+    def skipped_csv_sales(self):
+        """عدد حركات sales.csv القديمة التي تُخطيت عند الترحيل لأن تاريخها غير صالح"""
+        return int(self._get_meta(self._connection(), 'csv_invalid_dates', 0))
+
+    # --- ترحيل ملفات CSV القديمة ---
+    @metrics.timed('store.import_csv')
+    def _import_csv_once(self, inventory_csv, sales_csv):
+        """نقل بيانات inventory.csv و sales.csv إلى قاعدة البيانات عند أول تشغيل فقط"""
+        with self.transaction() as conn:
+            if self._get_meta(conn, 'csv_imported'):
+                return
+            if inventory_csv and os.path.exists(inventory_csv):
+                self._insert_inventory(conn, pd.read_csv(inventory_csv))
+            if sales_csv and os.path.exists(sales_csv):
+                sales = pd.read_csv(sales_csv, dtype={'التاريخ': str, 'الصنف': str, 'ملاحظة': str})
+                if 'ملاحظة' not in sales.columns:
+                    sales['ملاحظة'] = ''
+                # الملفات القديمة قد تحتوي تواريخ بصيغ مختلفة (05/01/2025 مثلاً): تُحوّل كلها إلى
+                # صيغة ISO التي يعتمد عليها حساب اليوم ويوم الأسبوع، والتي لا يمكن قراءتها تُتخطى.
+                # التواريخ غير ISO تُقرأ باليوم أولاً كما تُكتب يدوياً في الإعدادات العربية
+                # (dayfirst لا يُطبق على صيغة ISO لأنه يقلب الشهر واليوم فيها أيضاً)
+                dates = pd.to_datetime(sales['التاريخ'], format='ISO8601', errors='coerce')
+                other = dates.isna() & sales['التاريخ'].notna()
+                if other.any():
+                    dates[other] = pd.to_datetime(
+                        sales.loc[other, 'التاريخ'], format='mixed', dayfirst=True, errors='coerce')
+                invalid = int(dates.isna().sum())
+                if invalid:
+                    metrics.count('store.import_invalid_dates', invalid)
+                    self._set_meta(conn, 'csv_invalid_dates', invalid)
+                    sales, dates = sales[dates.notna()], dates[dates.notna()]
+                # تحويل الأعمدة كاملة مرة واحدة بدلاً من المرور على السجل سطراً سطراً
+                names = sales['الصنف'].fillna('')
+                item_ids = names.map(self._item_ids(conn, names.unique()))
+                meters = pd.to_numeric(sales['أمتار'], errors='coerce').fillna(0.0)
+                conn.executemany(SALES_INSERT, zip(
+                    dates.dt.strftime('%Y-%m-%d %H:%M:%S').tolist(), item_ids.tolist(), meters.tolist(),
+                    sales['ملاحظة'].fillna('').tolist(),
+                ))
+                self._execute_script(conn, ROLLUPS_REBUILD)
+            self._set_meta(conn, 'csv_imported', 1)
+            self._bump_version(conn, 'inventory', 'sales', 'names')
+
+    def _insert_inventory(self, conn, inventory_df):
+        if 'المتبقي' not in inventory_df.columns:
+            inventory_df = inventory_df.assign(المتبقي=inventory_df['الافتتاحي'])
+        conn.executemany(
+            "INSERT INTO inventory (name, opening, remaining) VALUES (?, ?, ?)",
+            [
+                (str(name), _float(opening), _float(remaining))
+                for name, opening, remaining in zip(
+                    inventory_df['الصنف'], inventory_df['الافتتاحي'], inventory_df['المتبقي'])
+            ],
+        )
+        self._item_ids(conn, inventory_df['الصنف'])
+
+    def _item_ids(self, conn, names):
+        """رقم كل اسم في قاموس الأصناف {الاسم: الرقم} (الأسماء الجديدة تُضاف للقاموس)"""
+        names = list(dict.fromkeys(str(name) for name in names))
+        conn.executemany("INSERT OR IGNORE INTO items (name) VALUES (?)", [(name,) for name in names])
+        if len(names) > 500:
+            return dict(conn.execute("SELECT name, id FROM items").fetchall())
+        return dict(conn.execute(
+            f"SELECT name, id FROM items WHERE name IN ({','.join('?' * len(names))})", names).fetchall())
+
+    # --- القراءة ---
+    @metrics.timed('store.inventory_frame')
+    def inventory_frame(self):
+        """جدول المخزن بنفس أعمدة inventory.csv"""
+        rows = self._connection().execute(
+            "SELECT name, opening, remaining FROM inventory ORDER BY id").fetchall()
+        return pd.DataFrame(rows, columns=INVENTORY_COLUMNS).astype({'الافتتاحي': float, 'المتبقي': float})
+
+    @metrics.timed('store.sales_frame')
+    def sales_frame(self, search=None, date_from=None, date_to=None, weekday=None):
+        """سجل المبيعات بنفس أعمدة sales.csv (كاملاً أو حسب التصفية، بترتيب التسجيل)"""
+        where, params = self._sales_where(search, date_from, date_to, weekday)
+        rows = self._connection().execute(
+            f"""
+            SELECT sales.ts, items.name, sales.meters, sales.note
+            FROM sales JOIN items ON items.id = sales.item_id {where} ORDER BY sales.id
+            """, params).fetchall()
+        return pd.DataFrame(rows, columns=SALES_COLUMNS).astype({'أمتار': float})
+
+    # --- القراءة كأعمدة (للقطة المبيعات في warehouse.columnar) ---
+    def last_item_id(self):
+        """آخر رقم في قاموس الأصناف (القاموس لا يُحذف منه، فتغير هذا الرقم يعني أسماء جديدة)"""
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM items").fetchone()[0]
+
+    def item_names(self):
+        """قاموس الأصناف كـ Series (رقم الصنف -> الاسم) مرتبة حسب الرقم"""
+        rows = self._connection().execute("SELECT id, name FROM items ORDER BY id").fetchall()
+        return pd.Series([name for _, name in rows], index=[item_id for item_id, _ in rows], dtype=object)
+
+    def sales_since(self, after_id=0):
+        """(رقم جيل السجل، الحركات التي رقمها أكبر من after_id) في قراءة واحدة متسقة
+
+        الحركات تُرجع كـ DataFrame بالأعمدة id, ts, item_id, meters, note بترتيب التسجيل.
+        رقم الجيل يتغير عند مسح السجل (reset) لأن أرقام الحركات تبدأ من جديد بعده.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            generation = int(self._get_meta(conn, 'sales_generation', 0))
+            rows = conn.execute(
+                "SELECT id, ts, item_id, meters, note FROM sales WHERE id > ? ORDER BY id", (int(after_id),)).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return generation, pd.DataFrame(rows, columns=['id', 'ts', 'item_id', 'meters', 'note'])
+
+    # --- التجميعات المسبقة ---
+    def sales_by_item(self):
+        """إجمالي الأمتار لكل صنف مرتباً من الأكثر مبيعاً"""
+        rows = self._connection().execute(
+            "SELECT item, meters, count FROM sales_by_item ORDER BY meters DESC, item").fetchall()
+        return pd.DataFrame(rows, columns=['الصنف', 'أمتار', 'عدد العمليات']).astype({'أمتار': float})
+
+    def sales_by_day(self, day):
+        """(عدد العمليات، إجمالي الأمتار) ليوم معين بصيغة YYYY-MM-DD"""
+        row = self._connection().execute(
+            "SELECT count, meters FROM sales_by_day WHERE day = ?", (str(day),)).fetchone()
+        return (row[0], row[1]) if row else (0, 0.0)
+
+    def sales_by_weekday(self, weekday_name):
+        """(عدد العمليات، إجمالي الأمتار) ليوم من أيام الأسبوع (Saturday...)"""
+        row = self._connection().execute(
+            "SELECT count, meters FROM sales_by_weekday WHERE weekday = ?",
+            (WEEKDAYS.index(weekday_name),)).fetchone()
+        return (row[0], row[1]) if row else (0, 0.0)
+
+    def sales_totals(self):
+        """(عدد العمليات، إجمالي الأمتار) لكل السجل"""
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(meters), 0) FROM sales_by_item").fetchone()
+        return row[0], row[1]
+
+    # --- العرض على صفحات ---
+    def _sales_where(self, search=None, date_from=None, date_to=None, weekday=None):
+        clauses, params = [], []
+        if search:
+            # البحث في جدول الأصناف المباعة (صغير) ثم استخدام فهرس الصنف في جدول المبيعات
+            clauses.append("item_id IN (SELECT item_id FROM sales_by_item WHERE item LIKE ? ESCAPE '\\')")
+            params.append(_like_pattern(search))
+        if date_from is not None:
+            clauses.append("day >= ?")
+            params.append(str(pd.Timestamp(date_from).date()))
+        if date_to is not None:
+            clauses.append("day <= ?")
+            params.append(str(pd.Timestamp(date_to).date()))
+        if weekday is not None:
+            clauses.append("weekday = ?")
+            params.append(WEEKDAYS.index(weekday))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    @metrics.timed('store.query_sales')
+    def query_sales(self, search=None, date_from=None, date_to=None, weekday=None, limit=50, offset=0):
+        """صفحة من سجل المبيعات (الأحدث أولاً) مع العدد الكلي للحركات المطابقة للتصفية"""
+        where, params = self._sales_where(search, date_from, date_to, weekday)
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM sales {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT sales.ts, items.name, sales.meters, sales.note
+            FROM sales JOIN items ON items.id = sales.item_id {where}
+            ORDER BY sales.day DESC, sales.id DESC LIMIT ? OFFSET ?
+            """,
+            params + [int(limit), int(offset)],
+        ).fetchall()
+        return pd.DataFrame(rows, columns=SALES_COLUMNS).astype({'أمتار': float}), total
+
+    @metrics.timed('store.sales_summary')
+    def sales_summary(self, search=None, date_from=None, date_to=None, weekday=None):
+        """(عدد العمليات، إجمالي الأمتار، عدد الأصناف) للحركات المطابقة للتصفية"""
+        where, params = self._sales_where(search, date_from, date_to, weekday)
+        row = self._connection().execute(
+            f"SELECT COUNT(*), COALESCE(SUM(meters), 0), COUNT(DISTINCT item_id) FROM sales {where}", params).fetchone()
+        return row[0], row[1], row[2]
+
+    @metrics.timed('store.query_inventory')
+    def query_inventory(self, search=None, limit=50, offset=0):
+        """صفحة من جدول المخزن مع العدد الكلي للأصناف المطابقة للبحث"""
+        where, params = '', []
+        if search:
+            where = "WHERE name LIKE ? ESCAPE '\\'"
+            params.append(_like_pattern(search))
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM inventory {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT name, opening, remaining FROM inventory {where} ORDER BY id LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)],
+        ).fetchall()
+        return pd.DataFrame(rows, columns=INVENTORY_COLUMNS).astype({'الافتتاحي': float, 'المتبقي': float}), total
+
+    # --- الكتابة ---
+    @metrics.timed('store.record_sale')
+    def record_sale(self, item, meters, note='', max_retries=MAX_RETRIES):
+        """خصم الكمية من الصنف وتسجيل الحركة في معاملة واحدة
+
+        القراءة تتم خارج قفل الكتابة، ثم يُطبق الخصم فقط إذا لم يتغير رقم إصدار الصنف
+        (مقارنة ثم خصم)، وإلا تُعاد المحاولة بالقيم الجديدة. لا تضيع أي عملية خصم
+        عند تزامن عدة جلسات، والتعارض على صنف لا يؤثر على الأصناف الأخرى.
+        يُرجع False إذا كانت الكمية المتبقية لا تكفي.
+        """
+        for attempt in range(max_retries):
+            row = self._connection().execute(
+                "SELECT id, remaining, version FROM inventory WHERE name = ? ORDER BY id LIMIT 1",
+                (item,),
+            ).fetchone()
+            if row is None or row[1] < meters:
+                return False
+            item_id, _, version = row
+            try:
+                if self._compare_and_deduct(item_id, version, item, meters, note):
+                    return True
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+            metrics.count('store.deduct_retries')
+            # انتظار قصير عشوائي قبل إعادة المحاولة حتى لا تتصادم الجلسات مرة أخرى
+            time.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+        raise ConcurrentUpdateError(f"تعذر خصم {item} بسبب تعديلات متزامنة، حاول مرة أخرى")
+
+    def _compare_and_deduct(self, item_id, version, item, meters, note):
+        """الخصم فقط إذا كان الصنف ما زال على نفس الإصدار الذي قُرئ"""
+        with self.transaction() as conn:
+            updated = conn.execute(
+                """
+                UPDATE inventory SET remaining = remaining - ?, version = version + 1
+                WHERE id = ? AND version = ?
+                """,
+                (meters, item_id, version),
+            ).rowcount
+            if updated:
+                self._append_sales(conn, [(_now(), item, meters, note)])
+                self._bump_version(conn, 'inventory', 'sales')
+        return bool(updated)
+
+    def _remaining_by_name(self, conn, names):
+        """(الكمية المتبقية، المعرف) لكل اسم، لأول صنف بهذا الاسم كما في record_sale"""
+        remaining, ids = {}, {}
+        names = list(dict.fromkeys(str(name) for name in names))
+        # تقسيم الأسماء حتى لا نتجاوز حد عدد المعاملات في SQLite
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, name, remaining FROM inventory WHERE name IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                chunk,
+            ).fetchall()
+            for item_id, name, value in rows:
+                if name not in ids:
+                    ids[name] = item_id
+                    remaining[name] = value
+        return pd.Series(remaining, dtype=float), ids
+
+    @metrics.timed('store.deduct_batch')
+    def deduct_batch(self, items, quantities, note=''):
+        """خصم دفعة كاملة من الأسطر (مثل أسطر فاتورة مؤكدة) في معاملة واحدة
+
+        الأسطر المكررة لنفس الصنف تُجمع، ويُحدّث كل صنف مرة واحدة، وتُضاف كل الحركات
+        بعملية كتابة واحدة. يُرجع DataFrame خطة الخصم (العمود deductible لكل سطر).
+        """
+        with self.transaction() as conn:
+            remaining, ids = self._remaining_by_name(conn, items)
+            plan = plan_batch_deduction([str(item) for item in items], quantities, remaining)
+            accepted = plan[plan['deductible']]
+            if not accepted.empty:
+                totals = accepted.groupby('item', sort=False)['quantity'].sum()
+                conn.executemany(
+                    "UPDATE inventory SET remaining = remaining - ?, version = version + 1 WHERE id = ?",
+                    [(float(quantity), ids[name]) for name, quantity in totals.items()],
+                )
+                ts = _now()
+                self._append_sales(conn, [
+                    (ts, name, float(quantity), note)
+                    for name, quantity in zip(accepted['item'], accepted['quantity'])
+                ])
+                self._bump_version(conn, 'inventory', 'sales')
+        return plan
+
+    def _append_sales(self, conn, rows):
+        """إضافة حركات (ts, item, meters, note) إلى السجل وتحديث التجميعات في نفس المعاملة"""
+        ids = self._item_ids(conn, [row[1] for row in rows])
+        conn.executemany(SALES_INSERT, [(ts, ids[str(item)], meters, note) for ts, item, meters, note in rows])
+        rollup_rows = [
+            {'ts': ts, 'item_id': ids[str(item)], 'item': str(item), 'meters': meters}
+            for ts, item, meters, _ in rows
+        ]
+        for statement in ROLLUPS_ADD:
+            conn.executemany(statement, rollup_rows)
+
+    @metrics.timed('store.replace_inventory')
+    def replace_inventory(self, inventory_df):
+        """استبدال جميع أصناف المخزن (رفع ملف Excel جديد)"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM inventory")
+            self._insert_inventory(conn, inventory_df)
+            self._bump_version(conn, 'inventory', 'names')
+
+    @metrics.timed('store.merge_inventory')
+    def merge_inventory(self, rows, batch_size=5000):
+        """دمج أصناف (الاسم، الكمية الافتتاحية) من مصدر متدفق مع المخزن الحالي
+
+        الأسطر تُجمع أولاً على دفعات في جدول مؤقت خاص بالاتصال (بدون قفل قاعدة البيانات)، ثم
+        يُطبق الدمج في معاملة واحدة: الأصناف الجديدة تُضاف، والموجودة تُعدل كميتها الافتتاحية
+        ويُعدل المتبقي بنفس الفرق (فلا تضيع المبيعات المسجلة)، والأصناف غير الموجودة في الملف
+        لا تتغير. الاسم المكرر في الملف تُجمع كمياته.
+        يُرجع {'rows' (عدد الأسماء المختلفة), 'added', 'updated', 'unchanged', 'clamped'}؛ clamped: أصناف كان سيصبح
+        متبقيها سالباً (الكمية الجديدة أقل من المبيع) فأصبح صفراً.
+        """
+        conn = self._connection()
+        conn.execute("DROP TABLE IF EXISTS temp.inventory_import")
+        conn.execute("CREATE TEMP TABLE inventory_import (name TEXT PRIMARY KEY, opening REAL NOT NULL)")
+        try:
+            batch = []
+            for row in rows:
+                batch.append((str(row[0]), float(row[1])))
+                if len(batch) >= batch_size:
+                    self._stage_inventory(conn, batch)
+                    batch = []
+            self._stage_inventory(conn, batch)
+            staged = conn.execute("SELECT COUNT(*) FROM temp.inventory_import").fetchone()[0]
+
+            with self.transaction() as conn:
+                changed = """
+                    SELECT COUNT(*) FROM inventory JOIN temp.inventory_import AS i ON i.name = inventory.name
+                    WHERE i.opening != inventory.opening
+                """
+                updated = conn.execute(changed).fetchone()[0]
+                clamped = conn.execute(
+                    changed + " AND inventory.remaining + i.opening - inventory.opening < 0").fetchone()[0]
+                unchanged = conn.execute(
+                    "SELECT COUNT(*) FROM inventory JOIN temp.inventory_import AS i ON i.name = inventory.name"
+                ).fetchone()[0] - updated
+                # كل التعبيرات تستخدم القيم القديمة للصف، ورقم الإصدار يُزاد حتى تُعيد عمليات الخصم
+                # المتزامنة قراءة الصنف
+                conn.execute(
+                    """
+                    UPDATE inventory SET
+                        remaining = MAX(remaining + (SELECT opening FROM temp.inventory_import AS i
+                                                     WHERE i.name = inventory.name) - opening, 0),
+                        opening = (SELECT opening FROM temp.inventory_import AS i WHERE i.name = inventory.name),
+                        version = version + 1
+                    WHERE opening != (SELECT opening FROM temp.inventory_import AS i WHERE i.name = inventory.name)
+                    """
+                )
+                added = conn.execute(
+                    """
+                    INSERT INTO inventory (name, opening, remaining)
+                    SELECT name, opening, opening FROM temp.inventory_import AS i
+                    WHERE NOT EXISTS (SELECT 1 FROM inventory WHERE inventory.name = i.name)
+                    ORDER BY i.rowid
+                    """
+                ).rowcount
+                conn.execute("INSERT OR IGNORE INTO items (name) SELECT name FROM temp.inventory_import ORDER BY rowid")
+                if updated or added:
+                    self._bump_version(conn, 'inventory')
+                if added:
+                    self._bump_version(conn, 'names')
+        finally:
+            conn.execute("DROP TABLE IF EXISTS temp.inventory_import")
+        return {'rows': staged, 'added': added, 'updated': updated, 'unchanged': unchanged, 'clamped': clamped}
+
+    def _stage_inventory(self, conn, batch):
+        if not batch:
+            return
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO temp.inventory_import (name, opening) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET opening = opening + excluded.opening
+                """,
+                batch,
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def reset(self):
+        """مسح جميع الأصناف والمبيعات"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM inventory")
+            conn.execute("DELETE FROM sales")
+            self._execute_script(conn, ROLLUPS_REBUILD)
+            self._set_meta(conn, 'sales_generation', int(self._get_meta(conn, 'sales_generation', 0)) + 1)
+            self._bump_version(conn, 'inventory', 'sales', 'names')
+
+    # --- أسماء الموردين المتعلمة ---
+    def aliases(self):
+        """{اسم الفاتورة الموحد: اسم الصنف في المخزن}"""
+        rows = self._connection().execute(
+            "SELECT aliases.alias, items.name FROM aliases JOIN items ON items.id = aliases.item_id").fetchall()
+        return dict(rows)
+
+    def aliases_version(self):
+        """يتغير مع كل إضافة أو حذف لاسم متعلم (مفتاح ذاكرة نتائج المطابقة)"""
+        return int(self._get_meta(self._connection(), 'aliases_version', 0))
+
+    def learn_aliases(self, pairs, source):
+        """حفظ أزواج (اسم المنتج في الفاتورة، اسم الصنف في المخزن)
+
+        source: 'deduction' (خصم مؤكد) أو 'manual' (تصحيح يدوي). الاسم المتعلم سابقاً يُستبدل.
+        الأسماء المطابقة حرفياً للصنف لا تُحفظ (المطابقة تجدها مباشرة). يُرجع عدد الأسماء المحفوظة.
+        """
+        learned = {}
+        for invoice_name, item in pairs:
+            alias = normalize_name(invoice_name)
+            if alias and alias != normalize_name(item):
+                learned[alias] = str(item)
+        if not learned:
+            return 0
+        with self.transaction() as conn:
+            item_ids = self._item_ids(conn, learned.values())
+            conn.executemany(
+                """
+                INSERT INTO aliases (alias, item_id, source, updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT(alias) DO UPDATE SET
+                    item_id = excluded.item_id, source = excluded.source, updated = excluded.updated
+                """,
+                [(alias, item_ids[item], source, _now()) for alias, item in learned.items()],
+            )
+            self._bump_version(conn, 'aliases')
+        return len(learned)
+
+    def forget_aliases(self, invoice_names):
+        """حذف أسماء متعلمة (بعد تصحيح مطابقة خاطئة)"""
+        aliases = [(normalize_name(name),) for name in invoice_names]
+        with self.transaction() as conn:
+            if conn.executemany("DELETE FROM aliases WHERE alias = ?", aliases).rowcount:
+                self._bump_version(conn, 'aliases')
+
+    def record_matches(self, sources, alias_hits=()):
+        """إحصاءات المطابقة: sources {طريقة المطابقة: عدد الأسطر}، alias_hits أسماء الفواتير التي
+        طابقها اسم متعلم (لعداد الاستخدام وآخر استخدام)"""
+        hits = {}
+        for name in alias_hits:
+            alias = normalize_name(name)
+            hits[alias] = hits.get(alias, 0) + 1
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO meta (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value
+                """,
+                [(f'match_{source}', int(n)) for source, n in sources.items() if n],
+            )
+            conn.executemany(
+                "UPDATE aliases SET hits = hits + ?, last_used = ? WHERE alias = ?",
+                [(n, _now(), alias) for alias, n in hits.items()],
+            )
+
+    def alias_stats(self):
+        """(عدد أسطر الفواتير حسب طريقة المطابقة، جدول الأسماء المتعلمة مرتباً بعدد الاستخدام)"""
+        conn = self._connection()
+        sources = {key[len('match_'):]: int(value) for key, value in conn.execute(
+            "SELECT key, value FROM meta WHERE key LIKE 'match\\_%' ESCAPE '\\'").fetchall()}
+        table = pd.read_sql_query(
+            """
+            SELECT aliases.alias, items.name AS item, aliases.source, aliases.hits,
+                   aliases.updated, aliases.last_used
+            FROM aliases JOIN items ON items.id = aliases.item_id
+            ORDER BY aliases.hits DESC, aliases.updated DESC
+            """,
+            conn,
+        )
+        return sources, table
+
+    # --- التصدير ---
+    @metrics.timed('store.export_inventory_csv')
+    def export_inventory_csv(self, path_or_buffer):
+        """تصدير المخزن إلى CSV بنفس شكل inventory.csv"""
+        self.inventory_frame().to_csv(path_or_buffer, index=False)
+
+    @metrics.timed('store.export_sales_csv')
+    def export_sales_csv(self, path_or_buffer):
+        """تصدير المبيعات إلى CSV بنفس شكل sales.csv"""
+        self.sales_frame().to_csv(path_or_buffer, index=False)